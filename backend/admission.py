@@ -0,0 +1,206 @@
+from flask import g, request
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from collections import OrderedDict, defaultdict, namedtuple
+from threading import Lock
+from instrumentation import metrics
+from auth import current_identity
+import math
+import time
+
+shed_requests = metrics.counter(
+    'http_requests_shed_total', 'Requests rejected by admission control.', ('endpoint', 'reason'))
+
+Limit = namedtuple('Limit', ['concurrency', 'rate', 'burst', 'methods', 'roles'],
+                   defaults=(None, None, None, None, None))
+
+# Endpoint -> limits. ``concurrency`` caps requests in progress at once,
+# ``rate``/``burst`` size each caller's token bucket (requests per second
+# and bucket capacity), ``methods`` and ``roles`` narrow the rule to those
+# methods and to callers with those roles. Only admins list every task, so
+# only their task lists are capped; other roles keep their own capacity.
+DEFAULT_LIMITS = {
+    'api.dashboard': {'concurrency': 4, 'rate': 2, 'burst': 10},
+    'api.tasks': {'concurrency': 8, 'rate': 5, 'burst': 20, 'methods': ['GET'], 'roles': ['admin']},
+    'api.generate_stories': {'concurrency': 2, 'rate': 0.1, 'burst': 5},
+    'api.create_story_job': {'concurrency': 4, 'rate': 0.1, 'burst': 5},
+    'api.login': {'concurrency': 8, 'rate': 1, 'burst': 10},
+    # Each open change feed holds a worker thread or greenlet until the
+    # client goes away; keep this below what one worker can serve at once.
+    'api.events': {'concurrency': 50},
+}
+
+MAX_BUCKETS = 10000
+
+class MemoryStore:
+    """Slots and token buckets for this worker only. The default, and what
+    the tests use. Keeps at most MAX_BUCKETS buckets, dropping the least
+    recently used."""
+
+    def __init__(self):
+        self._active = defaultdict(int)
+        self._buckets = OrderedDict()
+        self._lock = Lock()
+
+    def acquire(self, key, limit):
+        with self._lock:
+            if self._active[key] >= limit:
+                return False
+            self._active[key] += 1
+            return True
+
+    def release(self, key):
+        with self._lock:
+            self._active[key] -= 1
+
+    def take(self, key, rate, burst):
+        """Take a token from ``key``'s bucket. Returns 0 when one was taken,
+        otherwise the seconds until one will be available."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+            return wait
+
+class RedisStore:
+    """Shares slots and token buckets between workers through Redis. Slot
+    counters expire after ``slot_ttl`` seconds without traffic, so slots
+    held by a worker that died are eventually returned."""
+
+    TAKE = """
+    local rate, burst, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or burst
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url, prefix='admission', slot_ttl=60):
+        import redis
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(self.TAKE)
+        self.prefix = prefix
+        self.slot_ttl = slot_ttl
+
+    def acquire(self, key, limit):
+        key = f'{self.prefix}:slots:{key}'
+        count, _ = self._client.pipeline().incr(key).expire(key, self.slot_ttl).execute()
+        if count > limit:
+            self._client.decr(key)
+            return False
+        return True
+
+    def release(self, key):
+        self._client.decr(f'{self.prefix}:slots:{key}')
+
+    def take(self, key, rate, burst):
+        return float(self._take(keys=[f'{self.prefix}:bucket:{key}'], args=[rate, burst, time.time()]))
+
+def store_from_config(config):
+    if config.get('ADMISSION_REDIS_URL'):
+        return RedisStore(config['ADMISSION_REDIS_URL'])
+    return MemoryStore()
+
+def _callers():
+    """Bucket keys the request must draw from: the JWT user's, or for
+    anonymous requests the address's plus, when a username was submitted,
+    that username's. The username bucket only adds a limit per account; it
+    never replaces the address's, which the client cannot choose."""
+    # The view's own jwt_required reports bad tokens; here they only mean
+    # the bucket is keyed by address instead.
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        identity = None
+    if identity:
+        return [f'user:{identity}']
+    body = request.get_json(silent=True)
+    username = body.get('username') if isinstance(body, dict) else None
+    keys = [f'addr:{request.remote_addr}']
+    if isinstance(username, str) and username:
+        keys.append(f'name:{username[:150]}')
+    return keys
+
+def _role():
+    try:
+        verify_jwt_in_request(optional=True)
+        return current_identity().role if get_jwt_identity() else None
+    except Exception:
+        return None
+
+class AdmissionControl:
+    """Sheds load on expensive endpoints before their handlers run.
+
+    Each caller (JWT user, or address and username when there is none)
+    draws from a token bucket per endpoint and gets 429 when it is empty; requests
+    beyond an endpoint's concurrency cap get 503. Both carry Retry-After
+    and count towards ``http_requests_shed_total``."""
+
+    def __init__(self):
+        self.store = MemoryStore()
+        self.limits = {}
+
+    def configure(self, store, overrides=None, enabled=True):
+        """``overrides`` replace DEFAULT_LIMITS per endpoint; an empty or
+        null rule removes that endpoint's limits."""
+        rules = {**DEFAULT_LIMITS, **(overrides or {})} if enabled else {}
+        self.store = store
+        self.limits = {endpoint: Limit(**rule) for endpoint, rule in rules.items() if rule}
+
+    def admit(self):
+        """before_request hook: None to let the request through, otherwise
+        the rejection response."""
+        limit = self.limits.get(request.endpoint)
+        if limit is None or (limit.methods and request.method not in limit.methods):
+            return None
+        if limit.roles and _role() not in limit.roles:
+            return None
+        endpoint = request.endpoint
+
+        if limit.rate:
+            wait = 0
+            for caller in _callers():
+                wait = self.store.take(f'{endpoint}:{caller}', limit.rate, limit.burst or 1)
+                if wait:
+                    break
+            if wait:
+                shed_requests.inc(endpoint, 'rate')
+                return {'error': 'Too many requests, please retry later'}, 429, {'Retry-After': str(math.ceil(wait))}
+
+        if limit.concurrency:
+            if not self.store.acquire(endpoint, limit.concurrency):
+                shed_requests.inc(endpoint, 'concurrency')
+                return {'error': 'Server busy, please retry'}, 503, {'Retry-After': '1'}
+            g.admission_slot = endpoint
+        return None
+
+    def release(self):
+        endpoint = g.pop('admission_slot', None)
+        if endpoint is not None:
+            self.store.release(endpoint)
+
+    def hold(self, response):
+        """Keep the request's slot until ``response`` is closed rather than
+        until teardown, for streams that outlive the request."""
+        endpoint = g.pop('admission_slot', None)
+        if endpoint is not None:
+            store = self.store
+            response.call_on_close(lambda: store.release(endpoint))
+        return response
+
+    def clear(self):
+        self.store = MemoryStore()
+
+admission = AdmissionControl()
@@ -1,17 +1,30 @@
 import os
-from groq import Groq
-from dotenv import load_dotenv
+import time
+import uuid
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Lock
 
-load_dotenv()
+MODEL = "llama-3.1-8b-instant"
 
-client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+# Created on first use, so the Groq SDK (and httpx) is only imported by
+# processes that generate stories. Tests can assign a fake with the same
+# ``chat.completions.create`` interface.
+client = None
+
+def get_client():
+    global client
+    if client is None:
+        from groq import Groq
+        client = Groq(api_key=os.getenv('GROQ_API_KEY'))
+    return client
 
 def generate_user_stories(description):
     if not description or not description.strip():
         return {'error': 'Project description is required'}, 400
-    
-    api_key = os.getenv('GROQ_API_KEY')
-    if not api_key:
+
+    if client is None and not os.getenv('GROQ_API_KEY'):
         return {'error': 'GROQ API key not configured'}, 500
 
     prompt = f"""Generate user stories from this project description:
@@ -21,8 +34,8 @@ def generate_user_stories(description):
     Return only the user stories, one per line."""
 
     try:
-        response = client.chat.completions.create(
-            model="llama-3.1-8b-instant",
+        response = get_client().chat.completions.create(
+            model=MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.7,
             max_tokens=500
@@ -32,3 +45,121 @@ def generate_user_stories(description):
     except Exception as e:
         print(f"GROQ API Error: {str(e)}")
         return {'error': f'AI service error: {str(e)}'}, 500
+
+def description_key(description):
+    normalized = ' '.join(description.split())
+    return hashlib.sha256(f'{MODEL}\n{normalized}'.encode('utf-8')).hexdigest()
+
+class StoryJob:
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = 'pending'
+        self.result = None
+        self.status_code = None
+        self._done = Event()
+
+    def finish(self, result, status_code):
+        self.result = result
+        self.status_code = status_code
+        self.status = 'done' if status_code == 200 else 'failed'
+        self._done.set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def to_dict(self):
+        data = {'id': self.id, 'status': self.status}
+        if self.status == 'done':
+            data['stories'] = self.result
+        elif self.status == 'failed':
+            data['error'] = self.result.get('error')
+        return data
+
+class StoryJobs:
+    """Background user-story generation.
+
+    Jobs run on a small thread pool. A description that is already being
+    generated joins the running job instead of starting another call, and
+    successful results are cached by content hash for ``cache_ttl`` seconds
+    (at most ``cache_size`` entries, least recently used evicted first)."""
+
+    def __init__(self, workers=2, cache_size=256, cache_ttl=3600, max_jobs=1024, clock=time.monotonic):
+        self.workers = workers
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.max_jobs = max_jobs
+        self._clock = clock
+        self._executor = None
+        self._lock = Lock()
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._cache = OrderedDict()
+
+    def configure(self, workers, cache_size, cache_ttl):
+        with self._lock:
+            self.workers = workers
+            self.cache_size = cache_size
+            self.cache_ttl = cache_ttl
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        stories, stored_at = entry
+        if self._clock() - stored_at >= self.cache_ttl:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return stories
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def submit(self, description):
+        key = description_key(description)
+        with self._lock:
+            running = self._in_flight.get(key)
+            if running is not None:
+                return running
+
+            job = StoryJob(key)
+            self._remember(job)
+            stories = self._cached(key)
+            if stories is not None:
+                job.finish(stories, 200)
+                return job
+
+            self._in_flight[key] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ai')
+        self._executor.submit(self._run, job, description)
+        return job
+
+    def _run(self, job, description):
+        job.status = 'running'
+        try:
+            result, status_code = generate_user_stories(description)
+        except Exception as e:
+            result, status_code = {'error': f'AI service error: {str(e)}'}, 500
+        with self._lock:
+            if status_code == 200:
+                self._cache[job.key] = (result, self._clock())
+                self._cache.move_to_end(job.key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            self._in_flight.pop(job.key, None)
+        job.finish(result, status_code)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def clear(self):
+        with self._lock:
+            self._jobs.clear()
+            self._cache.clear()
+
+story_jobs = StoryJobs()
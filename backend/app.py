@@ -1,65 +1,130 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 from database import db
+from engine import DEFAULTS, engine_options, replica_binds, init_engine
+from instrumentation import init_instrumentation
+from json_provider import init_json
+from wire import init_compression
 from routes import api
+from ai_service import story_jobs
+from events import feed, backend_from_config
+from replica import sticky_writes
+from admission import admission, store_from_config
 from dotenv import load_dotenv
+import json
 import os
 import logging
 
-load_dotenv()
-
-app = Flask(__name__)
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
-# Use SQLite for development if DATABASE_URL is not set or PostgreSQL is not available
-database_url = os.getenv('DATABASE_URL')
-if not database_url or 'postgresql' not in database_url:
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///project_mgmt.db'
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = database_url
+def load_config():
+    """Settings from the environment (and .env), before per-app overrides."""
+    load_dotenv()
+    config = {
+        # Use SQLite for development if DATABASE_URL is not set
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL') or 'sqlite:///project_mgmt.db',
+        # Optional read replica for GET requests
+        'DATABASE_REPLICA_URL': os.getenv('DATABASE_REPLICA_URL'),
+        'REPLICA_STICKY_SECONDS': float(os.getenv('REPLICA_STICKY_SECONDS', 5)),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'dev-secret-key'),
+        'BCRYPT_ROUNDS': int(os.getenv('BCRYPT_ROUNDS', 12)),
+        'HASH_WORKERS': int(os.getenv('HASH_WORKERS', os.cpu_count() or 4)),
+        'HASH_QUEUE_LIMIT': int(os.getenv('HASH_QUEUE_LIMIT', 16)),
+        'USER_CACHE_TTL': int(os.getenv('USER_CACHE_TTL', 30)),
+        'USER_CACHE_SIZE': int(os.getenv('USER_CACHE_SIZE', 1024)),
+        'JWT_ROLE_CLAIM': os.getenv('JWT_ROLE_CLAIM', 'false').lower() == 'true',
+        'AI_WORKERS': int(os.getenv('AI_WORKERS', 2)),
+        'AI_CACHE_SIZE': int(os.getenv('AI_CACHE_SIZE', 256)),
+        'AI_CACHE_TTL': int(os.getenv('AI_CACHE_TTL', 3600)),
+        'SLOW_QUERY_MS': int(os.getenv('SLOW_QUERY_MS', 200)),
+        'EVENTS_REDIS_URL': os.getenv('EVENTS_REDIS_URL'),
+        'EVENTS_QUEUE_SIZE': int(os.getenv('EVENTS_QUEUE_SIZE', 1000)),
+        'EVENTS_HEARTBEAT': int(os.getenv('EVENTS_HEARTBEAT', 15)),
+        'JSON_ORJSON': os.getenv('JSON_ORJSON', 'true').lower() == 'true',
+        # gzip/brotli responses of at least this many bytes (streams always)
+        'COMPRESS_MIN_BYTES': int(os.getenv('COMPRESS_MIN_BYTES', 1024)),
+        'COMPRESS_LEVEL': int(os.getenv('COMPRESS_LEVEL', 6)),
+        # Per-endpoint concurrency caps and token buckets (admission.py);
+        # ADMISSION_LIMITS is JSON overriding DEFAULT_LIMITS per endpoint
+        'ADMISSION_ENABLED': os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true',
+        'ADMISSION_LIMITS': json.loads(os.getenv('ADMISSION_LIMITS') or '{}'),
+        'ADMISSION_REDIS_URL': os.getenv('ADMISSION_REDIS_URL'),
+        # Reverse proxies in front of the app whose X-Forwarded-For is
+        # trusted; without it every caller has the proxy's address
+        'PROXY_FIX_X_FOR': int(os.getenv('PROXY_FIX_X_FOR', 0)),
+    }
+    for key in DEFAULTS:
+        config[key] = int(os.getenv(key, DEFAULTS[key]))
+    return config
 
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'dev-secret-key')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+def create_app(config=None):
+    """Build the API app. ``config`` overrides the environment settings.
 
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+    Nothing expensive happens here: database connections, the bcrypt pool
+    and the AI client are all created on first use."""
+    app = Flask(__name__)
+    app.config.update(load_config())
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(app.config))
+    if app.config['PROXY_FIX_X_FOR']:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
+    init_json(app)
+    # after_request hooks run last-registered first, so compression goes in
+    # before instrumentation, which then records the uncompressed size.
+    init_compression(app)
 
-db.init_app(app)
-jwt = JWTManager(app)
-CORS(app)
+    db.init_app(app)
+    init_engine(app, db)
+    init_instrumentation(app, db)
+    jwt = JWTManager(app)
+    CORS(app)
+    story_jobs.configure(app.config['AI_WORKERS'], app.config['AI_CACHE_SIZE'], app.config['AI_CACHE_TTL'])
+    feed.configure(backend_from_config(app.config), app.config['EVENTS_QUEUE_SIZE'])
+    sticky_writes.configure(app.config['REPLICA_STICKY_SECONDS'])
+    admission.configure(store_from_config(app.config), app.config['ADMISSION_LIMITS'], app.config['ADMISSION_ENABLED'])
 
-app.register_blueprint(api, url_prefix='/api')
+    app.register_blueprint(api, url_prefix='/api')
+    register_error_handlers(app, jwt)
+    return app
 
-@app.errorhandler(404)
-def not_found(error):
-    return jsonify({'error': 'Resource not found'}), 404
+def register_error_handlers(app, jwt):
+    @app.errorhandler(404)
+    def not_found(error):
+        return jsonify({'error': 'Resource not found'}), 404
 
-@app.errorhandler(500)
-def internal_error(error):
-    db.session.rollback()
-    logger.error(f'Internal server error: {error}')
-    return jsonify({'error': 'Internal server error'}), 500
+    @app.errorhandler(500)
+    def internal_error(error):
+        db.session.rollback()
+        logger.error(f'Internal server error: {error}')
+        return jsonify({'error': 'Internal server error'}), 500
 
-@app.errorhandler(400)
-def bad_request(error):
-    return jsonify({'error': 'Bad request'}), 400
+    @app.errorhandler(400)
+    def bad_request(error):
+        return jsonify({'error': 'Bad request'}), 400
 
-@jwt.expired_token_loader
-def expired_token_callback(jwt_header, jwt_payload):
-    return jsonify({'error': 'Token has expired'}), 401
+    @jwt.expired_token_loader
+    def expired_token_callback(jwt_header, jwt_payload):
+        return jsonify({'error': 'Token has expired'}), 401
 
-@jwt.invalid_token_loader
-def invalid_token_callback(error):
-    return jsonify({'error': 'Invalid token'}), 401
+    @jwt.invalid_token_loader
+    def invalid_token_callback(error):
+        return jsonify({'error': 'Invalid token'}), 401
 
-@jwt.unauthorized_loader
-def missing_token_callback(error):
-    return jsonify({'error': 'Authentication required'}), 401
+    @jwt.unauthorized_loader
+    def missing_token_callback(error):
+        return jsonify({'error': 'Authentication required'}), 401
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         try:
-            db.create_all()
+            from migrations import upgrade
+            upgrade()
             from database import User
             from auth import hash_password
             if not User.query.filter_by(username='admin').first():
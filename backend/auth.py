@@ -1,22 +1,181 @@
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask import current_app, g, abort, has_app_context
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
+from sqlalchemy import event
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from functools import wraps
+from threading import Lock, BoundedSemaphore
+from database import db, User
 import bcrypt
+import time
 
-def hash_password(password):
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+Identity = namedtuple('Identity', ['id', 'username', 'role'])
+
+DEFAULT_BCRYPT_ROUNDS = 12
+
+def bcrypt_rounds():
+    if has_app_context():
+        return current_app.config.get('BCRYPT_ROUNDS', DEFAULT_BCRYPT_ROUNDS)
+    return DEFAULT_BCRYPT_ROUNDS
+
+def hash_password(password, rounds=None):
+    salt = bcrypt.gensalt(rounds or bcrypt_rounds())
+    return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password, hashed):
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+def needs_rehash(hashed):
+    """True when ``hashed`` was made with a different cost than configured."""
+    try:
+        return int(hashed.split('$')[2]) != bcrypt_rounds()
+    except (IndexError, ValueError):
+        return True
+
+class HashingBusy(Exception):
+    pass
+
+class HashingPool:
+    """Bounded executor for bcrypt work.
+
+    At most ``HASH_WORKERS`` hashes run at once and at most
+    ``HASH_QUEUE_LIMIT`` more wait for a worker; beyond that calls fail fast
+    with HashingBusy so a login burst cannot occupy every request worker.
+    The executor is started on first use, after any worker fork."""
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._lock = Lock()
+
+    def _start(self):
+        with self._lock:
+            if self._executor is None:
+                workers = current_app.config.get('HASH_WORKERS', 4)
+                queue_limit = current_app.config.get('HASH_QUEUE_LIMIT', 16)
+                self._slots = BoundedSemaphore(workers + queue_limit)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+            return self._executor, self._slots
+
+    def submit(self, fn, *args):
+        executor, slots = self._start()
+        if not slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        return future
+
+    def run(self, fn, *args):
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=current_app.config.get('HASH_TIMEOUT', 10))
+        except TimeoutError:
+            raise HashingBusy()
+
+    def hash(self, password):
+        return self.run(hash_password, password, bcrypt_rounds())
+
+    def verify(self, password, hashed):
+        return self.run(verify_password, password, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+            self._executor = None
+            self._slots = None
+
+hashing_pool = HashingPool()
+
+class IdentityCache:
+    """Process-wide LRU of user id -> Identity with a TTL.
+
+    Entries are dropped when the user row changes in this process; other
+    workers see a change after at most ``USER_CACHE_TTL`` seconds. A TTL of
+    0 disables the cache."""
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, user_id):
+        ttl = current_app.config.get('USER_CACHE_TTL', 30)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            identity, stored_at = entry
+            if self._clock() - stored_at >= ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def set(self, identity):
+        if not current_app.config.get('USER_CACHE_TTL', 30):
+            return
+        size = current_app.config.get('USER_CACHE_SIZE', 1024)
+        with self._lock:
+            self._entries[identity.id] = (identity, self._clock())
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+identity_cache = IdentityCache()
+
+@event.listens_for(User, 'after_insert')
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _invalidate_identity(mapper, connection, target):
+    identity_cache.invalidate(target.id)
+
+def create_token(user, expires_delta):
+    claims = {}
+    if current_app.config.get('JWT_ROLE_CLAIM'):
+        claims = {'role': user.role, 'username': user.username}
+    return create_access_token(identity=str(user.id), expires_delta=expires_delta, additional_claims=claims)
+
+def _resolve_identity(user_id):
+    claims = get_jwt()
+    if 'role' in claims:
+        return Identity(user_id, claims.get('username'), claims['role'])
+
+    identity = identity_cache.get(user_id)
+    if identity is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            abort(404)
+        identity = Identity(user.id, user.username, user.role)
+        identity_cache.set(identity)
+    return identity
+
+def current_identity():
+    """Identity of the JWT user, resolved at most once per request."""
+    user_id = int(get_jwt_identity())
+    cached = g.get('identity')
+    if cached is None or cached.id != user_id:
+        g.identity = _resolve_identity(user_id)
+    return g.identity
+
 def role_required(allowed_roles):
     def decorator(f):
         @wraps(f)
         @jwt_required()
         def wrapper(*args, **kwargs):
-            from database import User
-            user_id = get_jwt_identity()
-            user = User.query.get(user_id)
-            if user.role not in allowed_roles:
+            if current_identity().role not in allowed_roles:
                 return {'error': 'Insufficient permissions'}, 403
             return f(*args, **kwargs)
         return wrapper
@@ -0,0 +1,168 @@
+"""Scenario benchmarks for the REST API per endpoint and role.
+
+    python benchmarks/bench_api.py [--scale small|medium|large] [--requests 200]
+        [--concurrency 1] [--only tasks] [--save baseline.json] [--compare baseline.json]
+
+Seeds a throwaway SQLite database (or --database URL) with datagen.py, runs
+each scenario through the app in-process, and reports throughput,
+p50/p95/p99 latency and SQL statements per request (from Server-Timing).
+--save writes the results as a JSON baseline; --compare exits non-zero when
+a scenario's p95 or query count regresses past --tolerance.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from database import db
+from benchmarks.datagen import SCALES, PASSWORD, WORDS, generate, roles
+
+WARMUP = 5
+
+# (name, method, path, roles). Paths may use {task} and {word}, filled per
+# request from the seeded id ranges.
+SCENARIOS = [
+    ('tasks_page', 'GET', '/api/tasks?limit=50', ('admin', 'manager', 'developer')),
+    ('tasks_filtered', 'GET', '/api/tasks?status=todo&sort=deadline&limit=50', ('admin', 'manager', 'developer')),
+    ('tasks_overdue', 'GET', '/api/tasks?overdue=true&limit=50', ('manager', 'developer')),
+    ('task_detail', 'GET', '/api/tasks/{task}', ('admin',)),
+    ('task_comments', 'GET', '/api/tasks/{task}/comments?limit=20', ('admin',)),
+    ('projects_page', 'GET', '/api/projects?limit=50', ('admin', 'manager', 'developer')),
+    ('dashboard', 'GET', '/api/dashboard', ('admin', 'manager', 'developer')),
+    ('search', 'GET', '/api/search?q={word}&limit=20', ('admin', 'manager', 'developer')),
+    ('login', 'POST', '/api/login', ('developer',)),
+]
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+def build_app(scale, database):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length',
+        'ADMISSION_ENABLED': False,
+        'SLOW_QUERY_MS': 60000
+    })
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        generate(scale)
+        print(f'Seeded {scale} in {time.perf_counter() - start:.1f}s')
+    return app
+
+def users_by_role(app, scale):
+    admins, managers, developers = roles(scale)
+    ids = {'admin': admins[0], 'manager': managers[0], 'developer': developers[0]}
+    with app.app_context():
+        tokens = {role: create_access_token(identity=str(id)) for role, id in ids.items()}
+    return ids, tokens
+
+def run_scenario(app, scale, method, path, role, ids, tokens, requests, concurrency):
+    rng = random.Random(7)
+    headers = {'Authorization': f'Bearer {tokens[role]}'}
+    body = json.dumps({'username': f'{role}{ids[role]}' if role != 'admin' else 'admin', 'password': PASSWORD})
+    urls = [path.format(task=rng.randint(1, scale['tasks']), word=rng.choice(WORDS))
+            for _ in range(WARMUP + requests)]
+
+    def call(url):
+        client = app.test_client()
+        start = time.perf_counter()
+        if method == 'POST':
+            response = client.post(url, data=body, content_type='application/json')
+        else:
+            response = client.get(url, headers=headers)
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, (url, response.status_code, response.get_data()[:200])
+        return elapsed, int(QUERIES.search(response.headers['Server-Timing']).group(1))
+
+    for url in urls[:WARMUP]:
+        call(url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        samples = list(pool.map(call, urls[WARMUP:]))
+    wall = time.perf_counter() - start
+
+    latencies = [s[0] * 1000 for s in samples]
+    cuts = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        'requests': requests,
+        'throughput': round(requests / wall, 1),
+        'p50_ms': round(cuts[49], 2),
+        'p95_ms': round(cuts[94], 2),
+        'p99_ms': round(cuts[98], 2),
+        'queries': max(s[1] for s in samples)
+    }
+
+def compare(results, baseline, tolerance):
+    """Scenario keys whose p95 grew more than ``tolerance`` or that now run
+    more SQL statements than the baseline."""
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get('results', {}).get(key)
+        if not before:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{key}: p95 {before['p95_ms']} -> {result['p95_ms']} ms")
+        if result['queries'] > before['queries']:
+            regressions.append(f"{key}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--only', help='comma-separated scenario names')
+    parser.add_argument('--database', help='database URL to seed instead of a temporary SQLite file')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON baseline to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth (default 0.25)')
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    app = build_app(scale, args.database)
+    ids, tokens = users_by_role(app, scale)
+    only = set(args.only.split(',')) if args.only else None
+
+    results = {}
+    print(f"{'scenario':<30} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+    for name, method, path, scenario_roles in SCENARIOS:
+        if only and name not in only:
+            continue
+        for role in scenario_roles:
+            requests = min(args.requests, 20) if name == 'login' else args.requests
+            result = run_scenario(app, scale, method, path, role, ids, tokens, requests, args.concurrency)
+            key = f'{name}/{role}'
+            results[key] = result
+            print(f"{key:<30} {result['throughput']:>8} {result['p50_ms']:>8} {result['p95_ms']:>8} "
+                  f"{result['p99_ms']:>8} {result['queries']:>8}")
+
+    report = {'scale': args.scale, 'concurrency': args.concurrency, 'results': results}
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f'Saved baseline to {args.save}')
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if (baseline.get('scale'), baseline.get('concurrency')) != (args.scale, args.concurrency):
+            print(f"Note: baseline ran at scale {baseline.get('scale')}, concurrency {baseline.get('concurrency')}")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against baseline')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Creating tasks one request at a time versus one POST /api/tasks/bulk.
+
+    python benchmarks/bench_bulk_insert.py [rows]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from database import db, User, Project, Task
+
+def build_app():
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length'
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password='x', role='admin'))
+        db.session.add(Project(name='Import', created_by=1))
+        db.session.commit()
+        token = create_access_token(identity='1')
+    return app, {'Authorization': f'Bearer {token}'}
+
+def payload(rows):
+    return [{'title': f'Imported {i}', 'project_id': 1, 'assigned_to': 1,
+             'deadline': '2030-01-01T00:00:00'} for i in range(rows)]
+
+def per_row(rows):
+    app, headers = build_app()
+    client = app.test_client()
+    start = time.perf_counter()
+    for item in payload(rows):
+        client.post('/api/tasks', data=json.dumps(item), content_type='application/json', headers=headers)
+    return time.perf_counter() - start, app
+
+def bulk(rows):
+    app, headers = build_app()
+    client = app.test_client()
+    start = time.perf_counter()
+    response = client.post('/api/tasks/bulk', data=json.dumps(payload(rows)),
+                           content_type='application/json', headers=headers)
+    assert response.status_code == 201, response.data
+    return time.perf_counter() - start, app
+
+def main(rows):
+    for label, run in [('per-row POST /api/tasks', per_row), ('POST /api/tasks/bulk', bulk)]:
+        elapsed, app = run(rows)
+        with app.app_context():
+            assert Task.query.count() == rows
+        print(f'{label}: {rows} rows in {elapsed:.2f}s ({rows / elapsed:.0f} rows/s)')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
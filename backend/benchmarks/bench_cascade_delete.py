@@ -0,0 +1,95 @@
+"""Deleting a large project: ORM cascade (load every task and comment, delete
+row by row) versus the set-based DELETEs in cascade.py.
+
+    python benchmarks/bench_cascade_delete.py [tasks]
+
+Both modes start from a copy of the same seeded database, with one comment
+per task plus user stories and memberships.
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text
+from app import create_app
+from database import db, User, Project, Task, Comment, UserStory, project_members
+from cascade import delete_project
+
+BATCH = 50000
+
+def build_app(path):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length',
+        'SLOW_QUERY_MS': 600000
+    })
+
+def seed(path, tasks):
+    app = build_app(path)
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username=f'user{i}', password='x', role='developer') for i in range(20)])
+        db.session.add_all([Project(name='Large', created_by=1), Project(name='Neighbour', created_by=1)])
+        db.session.flush()
+        db.session.execute(project_members.insert(), [{'project_id': p, 'user_id': u}
+                                                      for p in (1, 2) for u in range(1, 21)])
+        db.session.add_all([UserStory(project_id=p, story=f'Story {i}') for p in (1, 2) for i in range(50)])
+        now = datetime.utcnow()
+        for start in range(0, tasks, BATCH):
+            db.session.execute(Task.__table__.insert(), [{
+                'title': f'Task {i}', 'status': 'todo', 'project_id': 1 if i else 2,
+                'assigned_to': i % 20 + 1, 'created_at': now
+            } for i in range(start, min(start + BATCH, tasks))])
+            db.session.execute(Comment.__table__.insert(), [{
+                'content': f'Comment on task {i + 1}', 'task_id': i + 1, 'user_id': 1, 'created_at': now
+            } for i in range(start, min(start + BATCH, tasks))])
+        db.session.commit()
+        from project_stats import rebuild_stats
+        rebuild_stats()
+        db.session.execute(text('PRAGMA wal_checkpoint(TRUNCATE)'))
+        db.session.remove()
+        db.engine.dispose()
+
+def orm_cascade(project):
+    db.session.delete(project)
+
+def set_based(project):
+    delete_project(project)
+
+def run(label, delete, source):
+    path = os.path.join(os.path.dirname(source), f'{delete.__name__}.db')
+    shutil.copy(source, path)
+    app = build_app(path)
+    with app.app_context():
+        project = db.session.get(Project, 1)
+        tracemalloc.start()
+        start = time.perf_counter()
+        delete(project)
+        db.session.commit()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        left = {
+            'tasks': Task.query.count(),
+            'comments': Comment.query.count(),
+            'user_stories': UserStory.query.count(),
+            'members': len(db.session.execute(project_members.select()).all())
+        }
+    print(f'{label:<28} {elapsed:8.2f}s  peak {peak / 1e6:7.1f} MB  left {left}')
+
+def main(tasks):
+    source = os.path.join(tempfile.mkdtemp(), 'seed.db')
+    start = time.perf_counter()
+    seed(source, tasks)
+    print(f'Seeded project 1 with {tasks - 1} tasks and comments in {time.perf_counter() - start:.1f}s')
+    for label, delete in [('ORM cascade', orm_cascade), ('set-based DELETEs', set_based)]:
+        run(label, delete, source)
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100001)
@@ -0,0 +1,68 @@
+"""Peak RSS of exporting every task: plain list vs streamed JSON/NDJSON.
+
+Each mode runs in a fresh subprocess so peaks do not mask each other.
+
+    python benchmarks/bench_export_memory.py [tasks]
+"""
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from database import db, User, Project, Task
+
+BATCH = 50000
+
+def build_app(path):
+    return create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length'
+    })
+
+def seed(path, tasks):
+    app = build_app(path)
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password='x', role='admin'))
+        db.session.add(Project(name='Export', created_by=1))
+        db.session.commit()
+        now = datetime.utcnow()
+        for start in range(0, tasks, BATCH):
+            db.session.execute(Task.__table__.insert(), [{
+                'title': f'Task {i}', 'description': 'x' * 100, 'status': 'todo',
+                'project_id': 1, 'assigned_to': 1, 'deadline': now, 'created_at': now
+            } for i in range(start, min(start + BATCH, tasks))])
+        db.session.commit()
+
+def export(path, query):
+    app = build_app(path)
+    with app.app_context():
+        token = create_access_token(identity='1')
+    start = time.perf_counter()
+    response = app.test_client().get(f'/api/tasks{query}', headers={'Authorization': f'Bearer {token}'},
+                                     buffered=False)
+    size = sum(len(chunk) for chunk in response.response)
+    response.close()
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f'{query or "(list)":>14}: {size / 1e6:.0f} MB body in {elapsed:.1f}s, peak RSS {peak_mb:.0f} MB')
+
+def main(tasks):
+    path = os.path.join(tempfile.mkdtemp(), 'export.db')
+    seed(path, tasks)
+    print(f'{tasks} tasks')
+    for query in ['', '?stream=json', '?stream=ndjson']:
+        subprocess.run([sys.executable, __file__, '--export', path, query], check=True)
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--export']:
+        export(sys.argv[2], sys.argv[3])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
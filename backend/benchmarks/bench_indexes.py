@@ -0,0 +1,97 @@
+"""Query plans and timings for the hot filter queries, with and without indexes.
+
+    python benchmarks/bench_indexes.py [task_count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import text
+from app import create_app
+from database import db, User, Project, Task, Comment, project_members
+from migrations import ensure_indexes
+
+QUERIES = {
+    'developer status counts': (
+        "SELECT status, count(id) FROM task WHERE assigned_to = :user GROUP BY status"
+    ),
+    'manager recent tasks': (
+        "SELECT id, title FROM task WHERE project_id IN ("
+        " SELECT id FROM project WHERE created_by = :user"
+        " UNION SELECT project_id FROM project_members WHERE user_id = :user)"
+        " ORDER BY created_at DESC LIMIT 5"
+    ),
+    'overdue open tasks': (
+        "SELECT count(id) FROM task WHERE deadline < :now AND status != 'done'"
+    ),
+    'project tasks by age': (
+        "SELECT id FROM task WHERE project_id = :project ORDER BY created_at"
+    ),
+    'task comments': (
+        "SELECT id, content FROM comment WHERE task_id = :task ORDER BY created_at"
+    ),
+}
+
+def seed(task_count):
+    rng = random.Random(42)
+    now = datetime.utcnow()
+    users = [{'id': i, 'username': f'user{i}', 'password': 'x', 'role': 'developer'} for i in range(1, 201)]
+    projects = [{'id': i, 'name': f'project{i}', 'created_by': rng.randint(1, 200), 'created_at': now}
+                for i in range(1, 1001)]
+    members = [{'user_id': rng.randint(1, 200), 'project_id': p['id']} for p in projects for _ in range(5)]
+    tasks = [{
+        'id': i,
+        'title': f'task{i}',
+        'status': rng.choice(['todo', 'in_progress', 'done', 'done']),
+        'deadline': now + timedelta(days=rng.randint(-30, 30)),
+        'project_id': rng.randint(1, 1000),
+        'assigned_to': rng.randint(1, 200),
+        'created_at': now - timedelta(minutes=i)
+    } for i in range(1, task_count + 1)]
+    comments = [{'content': 'c', 'task_id': rng.randint(1, task_count), 'user_id': 1, 'created_at': now}
+                for _ in range(task_count)]
+
+    db.session.execute(User.__table__.insert(), users)
+    db.session.execute(Project.__table__.insert(), projects)
+    db.session.execute(project_members.insert(), members)
+    db.session.execute(Task.__table__.insert(), tasks)
+    db.session.execute(Comment.__table__.insert(), comments)
+    db.session.commit()
+
+def run(label):
+    params = {'user': 7, 'now': datetime.utcnow(), 'project': 7, 'task': 7}
+    print(f'\n== {label} ==')
+    for name, sql in QUERIES.items():
+        plan = db.session.execute(text('EXPLAIN QUERY PLAN ' + sql), params).all()
+        start = time.perf_counter()
+        for _ in range(20):
+            db.session.execute(text(sql), params).all()
+        elapsed = (time.perf_counter() - start) / 20 * 1000
+        print(f'{name}: {elapsed:.2f} ms')
+        for row in plan:
+            print(f'    {row[-1]}')
+
+def main(task_count):
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}'})
+
+    with app.app_context():
+        db.create_all()
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(db.engine)
+        seed(task_count)
+        db.session.execute(text('ANALYZE'))
+        run('without indexes')
+
+        ensure_indexes()
+        db.session.execute(text('ANALYZE'))
+        run('with indexes')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,101 @@
+"""Login throughput and read latency while a login storm is running.
+
+Runs the API on a local threaded server twice: with a small bounded hashing
+pool and with an effectively unbounded one.
+
+    python benchmarks/bench_login_storm.py [seconds]
+"""
+import http.client
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from werkzeug.serving import make_server
+from app import create_app
+from database import db, User
+from auth import hash_password, hashing_pool
+
+LOGIN_THREADS = 32
+READ_THREADS = 4
+
+def build_app(workers, queue_limit):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length',
+        'ADMISSION_ENABLED': False,
+        'HASH_WORKERS': workers,
+        'HASH_QUEUE_LIMIT': queue_limit
+    })
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password=hash_password('admin123'), role='admin'))
+        db.session.commit()
+    return app
+
+def request(port, method, path, body=None, token=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request(method, path, body=json.dumps(body) if body else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    conn.close()
+    return response.status, data
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else float('nan')
+
+def scenario(label, workers, queue_limit, seconds):
+    hashing_pool.shutdown()
+    app = build_app(workers, queue_limit)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    credentials = {'username': 'admin', 'password': 'admin123'}
+    token = json.loads(request(port, 'POST', '/api/login', credentials)[1])['token']
+
+    deadline = time.perf_counter() + seconds
+    logins = {'ok': 0, 'shed': 0}
+    read_latencies = []
+    lock = threading.Lock()
+
+    def login_loop():
+        while time.perf_counter() < deadline:
+            status, _ = request(port, 'POST', '/api/login', credentials)
+            with lock:
+                logins['ok' if status == 200 else 'shed'] += 1
+
+    def read_loop():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            request(port, 'GET', '/api/users', token=token)
+            with lock:
+                read_latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(LOGIN_THREADS)]
+    threads += [threading.Thread(target=read_loop) for _ in range(READ_THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    server.shutdown()
+
+    print(f'{label}: logins/s={logins["ok"] / seconds:.1f} shed={logins["shed"]} '
+          f'reads={len(read_latencies)} read p50={percentile(read_latencies, 0.5):.1f}ms '
+          f'p99={percentile(read_latencies, 0.99):.1f}ms')
+
+if __name__ == '__main__':
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    cpus = os.cpu_count() or 4
+    scenario(f'bounded pool ({cpus} workers, queue 4)', cpus, 4, seconds)
+    scenario('unbounded (64 workers, queue 1000)', 64, 1000, seconds)
@@ -0,0 +1,97 @@
+"""GET /api/search over the full-text index versus a LIKE scan of comments.
+
+    python benchmarks/bench_search.py [comments]
+
+Comments are written through the index triggers, so the load phase also
+shows what keeping the index in sync costs per row.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert, text
+from app import create_app
+from database import db, User, Project, Task, Comment, project_members
+
+BATCH = 50000
+TASKS = 10000
+REPEATS = 20
+
+def vocabulary(rng, size=20000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+def build_app(comments):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length',
+        'SLOW_QUERY_MS': 60000
+    })
+    rng = random.Random(42)
+    words = vocabulary(rng)
+    # Zipf-like: a few words are everywhere, most are rare.
+    cumulative, total = [], 0.0
+    for rank in range(len(words)):
+        total += 1 / (rank + 1)
+        cumulative.append(total)
+
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([User(username='admin', password='x', role='admin'),
+                            User(username='manager', password='x', role='manager')])
+        db.session.add_all([Project(name=f'Project {i}', created_by=1) for i in range(100)])
+        db.session.flush()
+        db.session.execute(insert(project_members), [{'user_id': 2, 'project_id': p} for p in range(1, 11)])
+        db.session.execute(insert(Task), [
+            {'title': ' '.join(rng.choices(words, cum_weights=cumulative, k=4)), 'project_id': i % 100 + 1}
+            for i in range(TASKS)
+        ])
+        db.session.commit()
+
+        start = time.perf_counter()
+        for offset in range(0, comments, BATCH):
+            db.session.execute(insert(Comment), [
+                {'content': ' '.join(rng.choices(words, cum_weights=cumulative, k=12)),
+                 'task_id': rng.randint(1, TASKS), 'user_id': 1}
+                for _ in range(min(BATCH, comments - offset))
+            ])
+            db.session.commit()
+        elapsed = time.perf_counter() - start
+        print(f'Loaded {comments} comments in {elapsed:.1f}s ({comments / elapsed:.0f} rows/s, index kept in sync)')
+
+        headers = {role: {'Authorization': f'Bearer {create_access_token(identity=str(id))}'}
+                   for id, role in ((1, 'admin'), (2, 'manager'))}
+    return app, words, headers
+
+def timed(run):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def main(comments):
+    app, words, headers = build_app(comments)
+    client = app.test_client()
+    terms = {'common': words[0], 'mid': words[500], 'rare': words[-1]}
+
+    for label, term in terms.items():
+        for role, auth in headers.items():
+            ms = timed(lambda: client.get(f'/api/search?q={term}&limit=20', headers=auth))
+            print(f'search {label:<6} term as {role:<7}: {ms:8.1f} ms (median of {REPEATS})')
+
+        with app.app_context():
+            # What filtering without an index costs: every comment is read.
+            statement = text('SELECT count(*) FROM comment WHERE content LIKE :pattern')
+            ms = timed(lambda: db.session.execute(statement, {'pattern': f'%{term}%'}).all())
+            print(f'LIKE   {label:<6} term, comments : {ms:8.1f} ms (median of {REPEATS})')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000000)
@@ -0,0 +1,96 @@
+"""Row serialization: ORM entities with per-field getters versus column
+tuples with a schema serializer, and the standard JSON provider versus
+orjson.
+
+    python benchmarks/bench_serializers.py [tasks]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from datetime import datetime
+from flask.json.provider import DefaultJSONProvider
+from flask_jwt_extended import create_access_token
+from sqlalchemy.orm import joinedload
+from app import create_app
+from database import db, Task
+from serializers import TASK
+from json_provider import OrjsonProvider, orjson
+from benchmarks.datagen import generate
+
+REPEATS = 5
+
+def orm_rows(now):
+    """What GET /api/tasks did before: entities, joined relations, getters."""
+    getters = {
+        'id': lambda t: t.id,
+        'title': lambda t: t.title,
+        'status': lambda t: t.status,
+        'project_id': lambda t: t.project_id,
+        'project_name': lambda t: t.project.name if t.project else None,
+        'assigned_to': lambda t: t.assigned_to,
+        'assignee_name': lambda t: t.assignee.username if t.assignee else None,
+        'deadline': lambda t: t.deadline.isoformat() if t.deadline else None,
+        'overdue': lambda t: t.deadline < now if t.deadline and t.status != 'done' else False
+    }
+    tasks = Task.query.options(joinedload(Task.project), joinedload(Task.assignee)).all()
+    items = [{name: get(t) for name, get in getters.items()} for t in tasks]
+    db.session.expunge_all()
+    return items
+
+def schema_rows(now):
+    query, serialize = TASK.query(now=now)
+    return serialize(query.all())
+
+def best(run):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = run()
+        samples.append(time.perf_counter() - start)
+    return min(samples) * 1000, statistics.median(samples) * 1000, result
+
+def main(tasks):
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length',
+        'SLOW_QUERY_MS': 60000
+    })
+    with app.app_context():
+        db.create_all()
+        generate({'users': 50, 'projects': 100, 'members': 5, 'tasks': tasks, 'comments': 0})
+        now = datetime.utcnow()
+
+        print(f'Fetch and serialize {tasks} tasks (min / median of {REPEATS}):')
+        results = {}
+        for label, run in [('ORM entities + getters', lambda: orm_rows(now)),
+                           ('column tuples + schema', lambda: schema_rows(now))]:
+            low, median, results[label] = best(run)
+            print(f'  {label:<26} {low:8.1f} / {median:8.1f} ms')
+        assert [sorted(i.items()) for i in results['ORM entities + getters']] == \
+               [sorted(i.items()) for i in results['column tuples + schema']]
+
+        items = results['column tuples + schema']
+        providers = [('json (default provider)', DefaultJSONProvider(app))]
+        if orjson is not None:
+            providers.append(('orjson provider', OrjsonProvider(app)))
+        print(f'Encode {tasks} tasks:')
+        for label, provider in providers:
+            low, median, body = best(lambda: provider.dumps(items, separators=(',', ':')))
+            print(f'  {label:<26} {low:8.1f} / {median:8.1f} ms  {len(body) / 1e6:.1f} MB')
+
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+    print('GET /api/tasks?stream=json end to end:')
+    for label, provider in providers:
+        app.json = provider
+        client = app.test_client()
+        low, median, _ = best(lambda: client.get('/api/tasks?stream=json', headers=headers).get_data())
+        print(f'  {label:<26} {low:8.1f} / {median:8.1f} ms')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,78 @@
+"""Concurrent readers and writers against a file SQLite database, with the
+default rollback journal versus the tuned engine (WAL, busy_timeout,
+synchronous=NORMAL, sized pool).
+
+    python benchmarks/bench_sqlite_concurrency.py [seconds]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from database import db, User, Project, Task
+from engine import engine_options, init_engine
+from routes import api
+
+READERS = 8
+WRITERS = 4
+
+def build_app(tuned):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    app.config['JWT_SECRET_KEY'] = 'bench-secret-key-of-reasonable-length'
+    if tuned:
+        app.config['DB_POOL_SIZE'] = READERS + WRITERS
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+    if tuned:
+        init_engine(app, db)
+    JWTManager(app)
+    app.register_blueprint(api, url_prefix='/api')
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='admin', password='x', role='admin'))
+        db.session.add(Project(name='Busy', created_by=1))
+        db.session.flush()
+        db.session.add_all([Task(title=f'Task {i}', project_id=1, assigned_to=1) for i in range(2000)])
+        db.session.commit()
+        token = create_access_token(identity='1')
+    return app, {'Authorization': f'Bearer {token}'}
+
+def scenario(label, tuned, seconds):
+    app, headers = build_app(tuned)
+    deadline = time.perf_counter() + seconds
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def loop(kind):
+        client = app.test_client()
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            if kind == 'reads':
+                response = client.get('/api/dashboard', headers=headers)
+            else:
+                response = client.post(f'/api/tasks/{i % 2000 + 1}/comments', data=json.dumps({'content': 'x'}),
+                                       content_type='application/json', headers=headers)
+            with lock:
+                counts[kind if response.status_code < 500 else 'errors'] += 1
+
+    threads = [threading.Thread(target=loop, args=('reads',)) for _ in range(READERS)]
+    threads += [threading.Thread(target=loop, args=('writes',)) for _ in range(WRITERS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f'{label}: reads/s={counts["reads"] / seconds:.0f} writes/s={counts["writes"] / seconds:.0f} '
+          f'errors={counts["errors"]}')
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    scenario('default (rollback journal)', False, seconds)
+    scenario('tuned (WAL)', True, seconds)
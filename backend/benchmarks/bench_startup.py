@@ -0,0 +1,37 @@
+"""Import and app-construction cost of a fresh worker, via ``python -X importtime``.
+
+    python benchmarks/bench_startup.py [top_n]
+"""
+import os
+import subprocess
+import sys
+
+BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+STARTUP = "from app import create_app; create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})"
+
+def import_times(code):
+    """Run ``code`` in a fresh interpreter and return {top-level package:
+    cumulative import time in microseconds}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                            cwd=BACKEND, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = [part.strip() for part in line[len('import time:'):].split('|')]
+        package = name.split('.')[0]
+        times[package] = max(times.get(package, 0), int(cumulative))
+    return times
+
+def main(top_n):
+    times = import_times(STARTUP)
+    for package, micros in sorted(times.items(), key=lambda item: -item[1])[:top_n]:
+        print(f'{package:>24}: {micros / 1000:8.1f} ms')
+    print('first AI call also imports:')
+    with_ai = import_times(STARTUP + '; import ai_service; ai_service.get_client()')
+    for package in ('groq', 'httpx'):
+        print(f'{package:>24}: {with_ai.get(package, 0) / 1000:8.1f} ms')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
@@ -0,0 +1,94 @@
+"""Response size and encode time per wire format on seeded payloads.
+
+    python benchmarks/bench_wire.py [--scale small|medium|large]
+
+Fetches real responses (a task page, the full task list, a project page
+and the dashboard) from a dataset seeded by datagen.py, then re-encodes
+each as JSON and MessagePack, in object-per-row and columnar shape, and
+compresses the result with gzip and brotli. msgpack and brotli columns are
+skipped when those packages are not installed.
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from flask_jwt_extended import create_access_token
+from app import create_app
+from database import db
+from wire import brotli, msgpack, BROTLI_QUALITY
+from benchmarks.datagen import SCALES, generate
+
+REPEATS = 5
+GZIP_LEVEL = 6
+
+PAYLOADS = [
+    ('tasks page (500)', '/api/tasks?limit=500'),
+    ('tasks full list', '/api/tasks'),
+    ('projects page (100)', '/api/projects?limit=100'),
+    ('dashboard', '/api/dashboard'),
+]
+
+def columnar(payload):
+    items = payload['items'] if isinstance(payload, dict) and 'items' in payload else payload
+    if not isinstance(items, list) or not items:
+        return None
+    table = {'columns': list(items[0]), 'rows': [list(item.values()) for item in items]}
+    return {**table, 'next_cursor': payload['next_cursor']} if isinstance(payload, dict) else table
+
+def timed(run):
+    samples = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = run()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, result
+
+def encoders(app):
+    dumps = app.json.dumps
+    yield 'json', lambda payload: dumps(payload, separators=(',', ':')).encode('utf-8')
+    if msgpack is not None:
+        yield 'msgpack', lambda payload: msgpack.packb(payload, default=app.json.default)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    args = parser.parse_args()
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        'JWT_SECRET_KEY': 'bench-secret-key-of-reasonable-length',
+        'ADMISSION_ENABLED': False,
+        'SLOW_QUERY_MS': 60000
+    })
+    with app.app_context():
+        db.create_all()
+        generate(SCALES[args.scale])
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+    client = app.test_client()
+
+    print(f"{'payload':<22} {'format':<18} {'bytes':>10} {'gzip':>9} {'brotli':>9} "
+          f"{'encode ms':>10} {'gzip ms':>8} {'brotli ms':>9}")
+    for label, path in PAYLOADS:
+        payload = json.loads(client.get(path, headers=headers).data)
+        shapes = [('items', payload), ('columns', columnar(payload))]
+        for encoding, encode in encoders(app):
+            for shape, data in shapes:
+                if data is None:
+                    continue
+                encode_ms, body = timed(lambda: encode(data))
+                gzip_ms, zipped = timed(lambda: gzip.compress(body, GZIP_LEVEL))
+                brotli_ms, squeezed = (timed(lambda: brotli.compress(body, quality=BROTLI_QUALITY))
+                                       if brotli is not None else (None, None))
+                print(f"{label:<22} {f'{encoding}/{shape}':<18} {len(body):>10} {len(zipped):>9} "
+                      f"{len(squeezed) if squeezed else '-':>9} {encode_ms:>10.2f} {gzip_ms:>8.2f} "
+                      f"{f'{brotli_ms:.2f}' if brotli_ms is not None else '-':>9}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Deterministic test data at configurable scale, written through the models.
+
+The same ``scale`` and ``seed`` always produce the same rows, so benchmark
+runs are comparable. User ids are laid out as: 1 the admin, then the
+managers, then the developers; every user's password is ``PASSWORD``.
+"""
+import random
+from itertools import islice
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+from database import db, User, Project, Task, Comment, project_members
+from auth import hash_password
+from project_stats import rebuild_stats
+
+PASSWORD = 'password'
+BATCH = 10000
+EPOCH = datetime(2025, 1, 1)
+
+SCALES = {
+    'small': {'users': 50, 'projects': 100, 'members': 5, 'tasks': 10000, 'comments': 20000},
+    'medium': {'users': 200, 'projects': 1000, 'members': 5, 'tasks': 100000, 'comments': 200000},
+    'large': {'users': 1000, 'projects': 5000, 'members': 8, 'tasks': 1000000, 'comments': 2000000},
+}
+
+WORDS = ('deploy', 'review', 'login', 'api', 'database', 'cache', 'report', 'export', 'billing',
+         'search', 'mobile', 'layout', 'timeout', 'migration', 'invoice', 'email', 'upload', 'dashboard')
+
+def _insert(model, rows):
+    """Insert an iterable of rows ``BATCH`` at a time, so the large scales
+    never hold every row in memory."""
+    rows = iter(rows)
+    while batch := list(islice(rows, BATCH)):
+        db.session.execute(insert(model), batch)
+
+def _text(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+def roles(scale):
+    """(admin ids, manager ids, developer ids) for ``scale``."""
+    managers = max(1, scale['users'] // 10)
+    return [1], list(range(2, 2 + managers)), list(range(2 + managers, scale['users'] + 1))
+
+def generate(scale, seed=42):
+    """Fill the current app's (empty) database. Call inside an app context."""
+    rng = random.Random(seed)
+    admins, managers, developers = roles(scale)
+    password = hash_password(PASSWORD)
+
+    _insert(User, [{'username': 'admin', 'password': password, 'role': 'admin'}] +
+            [{'username': f'manager{i}', 'password': password, 'role': 'manager'} for i in managers] +
+            [{'username': f'developer{i}', 'password': password, 'role': 'developer'} for i in developers])
+
+    _insert(Project, [{
+        'name': f'Project {i}',
+        'description': _text(rng, 12),
+        'created_by': rng.choice(managers),
+        'created_at': EPOCH + timedelta(hours=i)
+    } for i in range(1, scale['projects'] + 1)])
+
+    team = {}
+    memberships = []
+    for project_id in range(1, scale['projects'] + 1):
+        members = rng.sample(managers + developers, min(scale['members'], len(managers) + len(developers)))
+        team[project_id] = [m for m in members if m in developers] or [None]
+        memberships += [{'user_id': m, 'project_id': project_id} for m in members]
+    _insert(project_members, memberships)
+
+    _insert(Task, ({
+        'title': _text(rng, 4).capitalize(),
+        'description': _text(rng, 20),
+        'status': rng.choices(('todo', 'in_progress', 'done'), (4, 3, 3))[0],
+        'project_id': (project_id := rng.randint(1, scale['projects'])),
+        'assigned_to': rng.choice(team[project_id]),
+        'deadline': EPOCH + timedelta(days=rng.randint(0, 730)) if rng.random() < 0.8 else None,
+        'created_at': EPOCH + timedelta(seconds=i * 60)
+    } for i in range(scale['tasks'])))
+
+    users = managers + developers
+    _insert(Comment, ({
+        'content': _text(rng, 15),
+        'task_id': rng.randint(1, scale['tasks']),
+        'user_id': rng.choice(users),
+        'created_at': EPOCH + timedelta(seconds=i * 30)
+    } for i in range(scale['comments'])))
+
+    db.session.commit()
+    # Core inserts skip the ORM events that maintain project_stats.
+    rebuild_stats()
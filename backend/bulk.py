@@ -0,0 +1,96 @@
+from sqlalchemy import insert, select
+from database import db, User, Project, Task, UserStory
+from project_stats import apply_inserted
+from datetime import datetime
+
+MAX_BATCH = 10000
+
+class BulkValidationError(ValueError):
+    def __init__(self, errors):
+        super().__init__('Invalid batch')
+        self.errors = errors
+
+TITLE_LENGTH = Task.title.type.length
+
+def _is_id(value):
+    # bool is an int subclass, but true is not project 1
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _task_row(item):
+    if not isinstance(item, dict):
+        raise ValueError('must be an object')
+    title = item.get('title')
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError('title is required')
+    if len(title) > TITLE_LENGTH:
+        raise ValueError(f'title must be at most {TITLE_LENGTH} characters')
+    description = item.get('description', '')
+    if description is not None and not isinstance(description, str):
+        raise ValueError('description must be a string')
+    if not _is_id(item.get('project_id')):
+        raise ValueError('project_id must be an integer')
+    if item.get('assigned_to') is not None and not _is_id(item['assigned_to']):
+        raise ValueError('assigned_to must be an integer')
+    deadline = item.get('deadline')
+    return {
+        'title': title,
+        'description': description,
+        'status': 'todo',
+        'project_id': item['project_id'],
+        'assigned_to': item.get('assigned_to'),
+        'deadline': datetime.fromisoformat(deadline) if deadline else None,
+        'created_at': datetime.utcnow()
+    }
+
+def _missing(model, ids):
+    if not ids:
+        return set()
+    found = db.session.execute(select(model.id).where(model.id.in_(ids))).scalars()
+    return set(ids) - set(found)
+
+def validate_tasks(items):
+    """Turn a list of task payloads into insert rows, or raise
+    BulkValidationError listing every bad entry by index."""
+    if not isinstance(items, list) or not items:
+        raise BulkValidationError([{'error': 'Expected a non-empty list of tasks'}])
+    if len(items) > MAX_BATCH:
+        raise BulkValidationError([{'error': f'At most {MAX_BATCH} tasks per request'}])
+
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            rows.append(_task_row(item))
+        except (ValueError, TypeError) as e:
+            errors.append({'index': index, 'error': str(e)})
+    if errors:
+        raise BulkValidationError(errors)
+
+    missing_projects = _missing(Project, {r['project_id'] for r in rows})
+    missing_users = _missing(User, {r['assigned_to'] for r in rows if r['assigned_to'] is not None})
+    for index, row in enumerate(rows):
+        if row['project_id'] in missing_projects:
+            errors.append({'index': index, 'error': 'project not found'})
+        elif row['assigned_to'] in missing_users:
+            errors.append({'index': index, 'error': 'assignee not found'})
+    if errors:
+        raise BulkValidationError(errors)
+    return rows
+
+def _insert(model, rows):
+    # Autoincrement ids are handed out in VALUES order, so sorting maps them
+    # back to the input. Asking SQLAlchemy to keep parameter order instead
+    # makes it fall back to one INSERT per row on SQLite.
+    statement = insert(model).returning(model.id)
+    return sorted(db.session.execute(statement, rows).scalars())
+
+def insert_tasks(rows):
+    """Insert validated task rows in one statement batch; returns their ids
+    in input order. The caller commits."""
+    ids = _insert(Task, rows)
+    apply_inserted(db.session.connection(), rows)
+    return ids
+
+def insert_user_stories(project_id, stories):
+    now = datetime.utcnow()
+    rows = [{'project_id': project_id, 'story': story, 'created_at': now} for story in stories]
+    return _insert(UserStory, rows) if rows else []
@@ -0,0 +1,34 @@
+from sqlalchemy import delete, select
+from database import db, Project, ProjectStats, Task, Comment, UserStory, project_members
+from project_stats import apply_deleted
+
+def _execute(statement):
+    # Rows are removed in bulk; nothing in the session needs to be matched
+    # against them, and letting SQLAlchemy fetch deleted ids would cost a
+    # round of RETURNING rows per statement.
+    return db.session.execute(statement, execution_options={'synchronize_session': False}).rowcount
+
+def delete_project(project):
+    """Delete a project with its comments, tasks, user stories, memberships
+    and stats as one DELETE per table, instead of loading every task and
+    comment into the session. Returns rows deleted per table; the caller
+    commits."""
+    tasks = select(Task.id).where(Task.project_id == project.id).scalar_subquery()
+    counts = {
+        'comments': _execute(delete(Comment).where(Comment.task_id.in_(tasks))),
+        'tasks': _execute(delete(Task).where(Task.project_id == project.id)),
+        'user_stories': _execute(delete(UserStory).where(UserStory.project_id == project.id)),
+        'members': _execute(delete(project_members).where(project_members.c.project_id == project.id)),
+    }
+    _execute(delete(ProjectStats).where(ProjectStats.project_id == project.id))
+    _execute(delete(Project).where(Project.id == project.id))
+    db.session.expunge(project)
+    return counts
+
+def delete_task(task):
+    """Delete a task and its comments with two statements; the caller
+    commits."""
+    _execute(delete(Comment).where(Comment.task_id == task.id))
+    _execute(delete(Task).where(Task.id == task.id))
+    apply_deleted(db.session.connection(), task.project_id, task.status)
+    db.session.expunge(task)
@@ -0,0 +1,59 @@
+from flask import request, make_response
+from sqlalchemy import func, select
+from database import db, Task, Comment, project_members
+from versions import current_version, version_subquery
+from wire import response_mimetype
+from pagination import stream_format, columnar
+from datetime import datetime
+import hashlib
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+
+def conditional(etag, build):
+    """Answer 304 when the client already holds ``etag``; otherwise call
+    ``build`` for the response and tag it. Every representation other than
+    plain JSON (MessagePack, streamed JSON or NDJSON, columnar) gets its own
+    tag, so a cached body is never revalidated as another format."""
+    variant = (response_mimetype(), stream_format(), columnar())
+    if variant != ('application/json', None, False):
+        etag = make_etag(etag, *variant)
+    if request.if_none_match.contains_weak(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(build())
+    response.set_etag(etag, weak=True)
+    response.vary.add('Accept')
+    return response
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+def _watermark(query):
+    count, latest = query.one()
+    return count, _iso(latest)
+
+def project_version(project):
+    tasks = _watermark(db.session.query(func.count(Task.id), func.max(Task.updated_at))
+                       .filter(Task.project_id == project.id))
+    members = db.session.query(func.count()).select_from(project_members) \
+        .filter(project_members.c.project_id == project.id).scalar()
+    return make_etag('project', project.id, _iso(project.updated_at), tasks, members)
+
+def task_version(task):
+    comments = _watermark(db.session.query(func.count(Comment.id), func.max(Comment.updated_at))
+                          .filter(Comment.task_id == task.id))
+    return make_etag('task', task.id, _iso(task.updated_at), comments)
+
+def task_list_version(user):
+    """Changes whenever a task, project, membership or user is written, or
+    an open task passes its deadline (overdue flags change with the clock,
+    not with writes). The next deadline comes from ix_task_open_deadline,
+    so a 304 costs the same however many tasks the user can see."""
+    next_overdue = select(func.min(Task.deadline)) \
+        .where(Task.status != 'done', Task.deadline >= datetime.utcnow()).scalar_subquery()
+    version, deadline = db.session.execute(select(version_subquery(), next_overdue)).one()
+    return make_etag('tasks', user, request.full_path, version, _iso(deadline))
+
+def project_list_version(user):
+    return make_etag('projects', user, request.full_path, current_version())
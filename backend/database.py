@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from replica import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,12 +19,20 @@ class Project(db.Model):
     status = db.Column(db.String(20), default='active')
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     tasks = db.relationship('Task', backref='project', lazy=True, cascade='all, delete-orphan')
     team_members = db.relationship('User', secondary='project_members', backref='projects')
 
+    __table_args__ = (
+        db.Index('ix_project_created_by', 'created_by'),
+        db.Index('ix_project_created_at_id', 'created_at', 'id'),
+    )
+
 project_members = db.Table('project_members',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id')),
-    db.Column('project_id', db.Integer, db.ForeignKey('project.id'))
+    db.Column('project_id', db.Integer, db.ForeignKey('project.id')),
+    db.Index('ix_project_members_user_project', 'user_id', 'project_id'),
+    db.Index('ix_project_members_project_user', 'project_id', 'user_id')
 )
 
 class Task(db.Model):
@@ -35,16 +44,47 @@ class Task(db.Model):
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'))
     assigned_to = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     comments = db.relationship('Comment', backref='task', lazy=True, cascade='all, delete-orphan')
 
+    __table_args__ = (
+        db.Index('ix_task_assigned_to_status', 'assigned_to', 'status'),
+        db.Index('ix_task_project_id_created_at', 'project_id', 'created_at'),
+        db.Index('ix_task_created_at_id', 'created_at', 'id'),
+        db.Index('ix_task_status', 'status'),
+        # Only open tasks can be overdue, so done tasks stay out of the index.
+        db.Index('ix_task_open_deadline', 'deadline',
+                 sqlite_where=db.text("status != 'done'"),
+                 postgresql_where=db.text("status != 'done'")),
+    )
+
+class ProjectStats(db.Model):
+    """Task counts per project, kept in step with Task writes (see project_stats.py)."""
+    project_id = db.Column(db.Integer, db.ForeignKey('project.id'), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    todo = db.Column(db.Integer, nullable=False, default=0)
+    in_progress = db.Column(db.Integer, nullable=False, default=0)
+    done = db.Column(db.Integer, nullable=False, default=0)
+
+class DataVersion(db.Model):
+    """A single counter bumped by every transaction that writes projects,
+    tasks, memberships or users (see versions.py)."""
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text, nullable=False)
     task_id = db.Column(db.Integer, db.ForeignKey('task.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     user = db.relationship('User', backref='comments')
 
+    __table_args__ = (
+        db.Index('ix_comment_task_id_created_at', 'task_id', 'created_at'),
+    )
+
 class UserStory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     project_id = db.Column(db.Integer, db.ForeignKey('project.id'))
@@ -0,0 +1,85 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from replica import REPLICA
+
+DEFAULTS = {
+    'DB_POOL_SIZE': 5,
+    'DB_MAX_OVERFLOW': 10,
+    'DB_POOL_RECYCLE': 1800,
+    'DB_POOL_TIMEOUT': 30,
+    'DB_STATEMENT_TIMEOUT_MS': 30000,
+    'SQLITE_BUSY_TIMEOUT_MS': 5000,
+}
+
+def _setting(config, key):
+    return int(config.get(key, DEFAULTS[key]))
+
+def _is_memory(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+def engine_options(config, uri=None, read_only=False):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URL (or ``uri``).
+
+    In-memory SQLite keeps SQLAlchemy's single static connection. File
+    SQLite and server databases get a sized pool; server databases also get
+    pre-ping and recycling so dropped connections are replaced quietly, and
+    Postgres statements are capped by ``DB_STATEMENT_TIMEOUT_MS``.
+    ``read_only`` Postgres sessions refuse writes."""
+    url = make_url(uri or config['SQLALCHEMY_DATABASE_URI'])
+    if _is_memory(url):
+        return {}
+
+    options = {
+        'pool_size': _setting(config, 'DB_POOL_SIZE'),
+        'max_overflow': _setting(config, 'DB_MAX_OVERFLOW'),
+        'pool_timeout': _setting(config, 'DB_POOL_TIMEOUT'),
+    }
+    if url.get_backend_name() == 'sqlite':
+        options['connect_args'] = {'timeout': _setting(config, 'SQLITE_BUSY_TIMEOUT_MS') / 1000}
+        return options
+
+    options['pool_pre_ping'] = True
+    options['pool_recycle'] = _setting(config, 'DB_POOL_RECYCLE')
+    if url.get_backend_name() == 'postgresql':
+        timeout = _setting(config, 'DB_STATEMENT_TIMEOUT_MS')
+        settings = f'-c statement_timeout={timeout}'
+        if read_only:
+            settings += ' -c default_transaction_read_only=on'
+        options['connect_args'] = {'options': settings}
+    return options
+
+def replica_binds(config):
+    """SQLALCHEMY_BINDS with a read-only ``replica`` engine when
+    ``DATABASE_REPLICA_URL`` is set. Binds do not inherit
+    SQLALCHEMY_ENGINE_OPTIONS, so the pool settings are repeated here."""
+    uri = config.get('DATABASE_REPLICA_URL')
+    if not uri:
+        return {}
+    return {REPLICA: {'url': uri, **engine_options(config, uri, read_only=True)}}
+
+def init_engine(app, db):
+    """Apply per-connection settings to the app's engines. File SQLite runs
+    in WAL mode so readers do not block the writer and vice versa; a SQLite
+    replica is opened query-only."""
+    with app.app_context():
+        engines = dict(db.engines)
+    busy_timeout = _setting(app.config, 'SQLITE_BUSY_TIMEOUT_MS')
+    for key, engine in engines.items():
+        if engine.dialect.name == 'sqlite':
+            _sqlite_pragmas(engine, busy_timeout, read_only=key == REPLICA)
+
+def _sqlite_pragmas(engine, busy_timeout, read_only):
+    wal = not _is_memory(engine.url)
+    if not wal and not read_only:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute(f'PRAGMA busy_timeout={busy_timeout}')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+        if read_only:
+            cursor.execute('PRAGMA query_only=ON')
+        cursor.close()
@@ -0,0 +1,153 @@
+from queue import Queue, Empty, Full
+from threading import Lock, Thread
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """Delivers events to subscribers in this process only. The default,
+    and what the tests use."""
+
+    def start(self, deliver):
+        self._deliver = deliver
+
+    def publish(self, event):
+        self._deliver(event)
+
+    def close(self):
+        pass
+
+class RedisBackend:
+    """Shares events between workers through a Redis pub/sub channel. Each
+    worker publishes to the channel and a listener thread hands everything
+    it receives, its own events included, to the local subscribers."""
+
+    def __init__(self, url, channel='project-management-events'):
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._pubsub = None
+
+    def start(self, deliver):
+        import redis
+        self._client = redis.Redis.from_url(self.url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(self.channel)
+
+        def listen():
+            for message in self._pubsub.listen():
+                try:
+                    deliver(json.loads(message['data']))
+                except Exception as e:
+                    logger.error(f'Dropped malformed event: {e}')
+
+        Thread(target=listen, name='events-redis', daemon=True).start()
+
+    def publish(self, event):
+        self._client.publish(self.channel, json.dumps(event))
+
+    def close(self):
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+class Subscription:
+    """One listener's queue of the events its user may see.
+
+    Project visibility is loaded when subscribing and then follows
+    membership and creation events, so filtering never touches the
+    database. A listener that falls ``queue_size`` events behind is sent a
+    single ``resync`` event instead of the backlog."""
+
+    def __init__(self, user, project_ids, queue_size):
+        self.user = user
+        self.project_ids = set(project_ids)
+        self._queue = Queue(queue_size)
+        self._overflowed = False
+
+    def visible(self, event):
+        kind = event['type']
+        if kind == 'project.member_added' and event.get('user_id') == self.user.id or \
+                kind == 'project.created' and event.get('created_by') == self.user.id:
+            self.project_ids.add(event['project_id'])
+
+        if self.user.role == 'admin':
+            return True
+        if kind.startswith('project.') or self.user.role == 'manager':
+            return event.get('project_id') in self.project_ids
+        return event.get('assigned_to') == self.user.id
+
+    def offer(self, event):
+        if not self.visible(event):
+            return
+        try:
+            self._queue.put_nowait(event)
+        except Full:
+            self._overflowed = True
+
+    def next(self, timeout):
+        """The next event, or None when ``timeout`` seconds pass quietly."""
+        if self._overflowed:
+            self._overflowed = False
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            return {'type': 'resync'}
+        try:
+            return self._queue.get(timeout=timeout)
+        except Empty:
+            return None
+
+class ChangeFeed:
+    """In-process pub/sub for task, project and comment changes.
+
+    Write handlers call ``publish`` after their transaction commits; the
+    backend carries the event to every worker, and each worker offers it to
+    its own subscriptions."""
+
+    def __init__(self, backend=None, queue_size=1000):
+        self.queue_size = queue_size
+        self._lock = Lock()
+        self._subscriptions = set()
+        self._backend = None
+        self.configure(backend or MemoryBackend(), queue_size)
+
+    def configure(self, backend, queue_size):
+        with self._lock:
+            if self._backend is not None:
+                self._backend.close()
+            self._backend = backend
+            self.queue_size = queue_size
+        backend.start(self._deliver)
+
+    def publish(self, type, **fields):
+        self._backend.publish({'type': type, **fields})
+
+    def _deliver(self, event):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.offer(event)
+
+    def subscribe(self, user, project_ids=()):
+        subscription = Subscription(user, project_ids, self.queue_size)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def clear(self):
+        with self._lock:
+            self._subscriptions.clear()
+
+def backend_from_config(config):
+    if config.get('EVENTS_REDIS_URL'):
+        return RedisBackend(config['EVENTS_REDIS_URL'])
+    return MemoryBackend()
+
+def sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+feed = ChangeFeed()
@@ -0,0 +1,60 @@
+from database import Task, Comment
+from datetime import datetime
+
+TASK_SORTS = {
+    'created_at': (Task.created_at, False),
+    'deadline': (Task.deadline, True),
+    'title': (Task.title, False),
+    'status': (Task.status, True),
+}
+
+COMMENT_SORTS = {
+    'created_at': (Comment.created_at, False),
+}
+
+class FilterError(ValueError):
+    pass
+
+def overdue(now):
+    return (Task.deadline < now) & (Task.status != 'done')
+
+def not_overdue(now):
+    # Spelled out rather than ~overdue(now): NOT on a NULL deadline is NULL.
+    return Task.deadline.is_(None) | (Task.deadline >= now) | (Task.status == 'done')
+
+def _int(args, name):
+    try:
+        return int(args[name])
+    except ValueError:
+        raise FilterError(f'{name} must be an integer')
+
+def _date(args, name):
+    try:
+        return datetime.fromisoformat(args[name])
+    except ValueError:
+        raise FilterError(f'{name} must be an ISO 8601 date')
+
+def filter_tasks(query, args, now):
+    """Apply the task list filters in ``args`` as SQL predicates:
+    ``status`` (comma-separated), ``project_id``, ``assigned_to`` (an id or
+    ``none``), ``overdue=true|false`` and the half-open deadline range
+    ``deadline_after`` <= deadline < ``deadline_before``."""
+    if args.get('status'):
+        query = query.filter(Task.status.in_([s.strip() for s in args['status'].split(',')]))
+    if 'project_id' in args:
+        query = query.filter(Task.project_id == _int(args, 'project_id'))
+    if 'assigned_to' in args:
+        if args['assigned_to'] == 'none':
+            query = query.filter(Task.assigned_to.is_(None))
+        else:
+            query = query.filter(Task.assigned_to == _int(args, 'assigned_to'))
+    if 'overdue' in args:
+        flag = args['overdue'].lower()
+        if flag not in ('true', 'false'):
+            raise FilterError('overdue must be true or false')
+        query = query.filter(overdue(now) if flag == 'true' else not_overdue(now))
+    if 'deadline_after' in args:
+        query = query.filter(Task.deadline >= _date(args, 'deadline_after'))
+    if 'deadline_before' in args:
+        query = query.filter(Task.deadline < _date(args, 'deadline_before'))
+    return query
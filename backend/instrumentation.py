@@ -0,0 +1,161 @@
+from flask import g, request, has_app_context, Response
+from sqlalchemy import event
+from collections import defaultdict
+from threading import Lock
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+def _label_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{v}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = name, help, labels
+        self._values = defaultdict(float)
+        self._lock = Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] += amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f'{self.name}{_label_text(self.labels, values)} {total:g}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [[0] * len(self.buckets), 0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.labels + ('le',)
+        with self._lock:
+            for values, (counts, count, total) in sorted(self._series.items()):
+                for bound, bucket in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{_label_text(names, values + (f"{bound:g}",))} {bucket}')
+                lines.append(f'{self.name}_bucket{_label_text(names, values + ("+Inf",))} {count}')
+                lines.append(f'{self.name}_count{_label_text(self.labels, values)} {count}')
+                lines.append(f'{self.name}_sum{_label_text(self.labels, values)} {total:g}')
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def counter(self, name, help, labels=()):
+        return self._metrics.setdefault(name, Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DURATION_BUCKETS):
+        return self._metrics.setdefault(name, Histogram(name, help, labels, buckets))
+
+    def expose(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.expose())
+        return '\n'.join(lines) + '\n'
+
+metrics = Registry()
+
+requests_total = metrics.counter(
+    'http_requests_total', 'Requests by endpoint, method and status.', ('endpoint', 'method', 'status'))
+request_duration = metrics.histogram(
+    'http_request_duration_seconds', 'Wall time per request.', ('endpoint',))
+request_queries = metrics.histogram(
+    'http_request_sql_queries', 'SQL statements per request.', ('endpoint',), QUERY_BUCKETS)
+request_sql_duration = metrics.histogram(
+    'http_request_sql_duration_seconds', 'Time spent in SQL per request.', ('endpoint',))
+response_size = metrics.histogram(
+    'http_response_size_bytes', 'Serialized response size.', ('endpoint',), SIZE_BUCKETS)
+slow_queries = metrics.counter(
+    'db_slow_queries_total', 'Statements slower than SLOW_QUERY_MS.', ('endpoint',))
+
+def _endpoint():
+    return request.endpoint or 'unmatched'
+
+def init_instrumentation(app, db):
+    """Record wall time, SQL statement count and time, and response size for
+    every request; report them in a Server-Timing header and on /metrics,
+    and log statements slower than ``SLOW_QUERY_MS``. Statements on every
+    bind count, the read replica included."""
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_start'].pop()
+        in_request = has_app_context() and 'request_start' in g
+        if in_request:
+            g.sql_count += 1
+            g.sql_time += elapsed
+        if elapsed * 1000 >= app.config.get('SLOW_QUERY_MS', 200):
+            endpoint = _endpoint() if in_request else 'background'
+            slow_queries.inc(endpoint)
+            logger.warning(f'Slow query ({elapsed * 1000:.1f} ms) in {endpoint}: {statement}')
+
+    def discard_timer(context):
+        starts = context.connection.info.get('query_start') if context.connection else None
+        if starts:
+            starts.pop()
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+        event.listen(engine, 'handle_error', discard_timer)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_start
+        endpoint = _endpoint()
+
+        requests_total.inc(endpoint, request.method, response.status_code)
+        request_duration.observe(elapsed, endpoint)
+        request_queries.observe(g.sql_count, endpoint)
+        request_sql_duration.observe(g.sql_time, endpoint)
+        if not response.is_streamed:
+            response_size.observe(response.calculate_content_length() or 0, endpoint)
+
+        response.headers['Server-Timing'] = (
+            f'app;dur={elapsed * 1000:.1f}, '
+            f'db;dur={g.sql_time * 1000:.1f};desc="{g.sql_count} queries"'
+        )
+        return response
+
+    @app.route('/metrics')
+    def prometheus_metrics():
+        return Response(metrics.expose(), mimetype='text/plain; version=0.0.4')
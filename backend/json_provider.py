@@ -0,0 +1,33 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask's JSON provider with orjson doing the work.
+
+    Accepts the same keyword arguments as ``json.dumps`` so callers such as
+    the streaming exporter need not care which provider is active. orjson
+    output is always compact; ``indent`` and ``sort_keys`` map to its
+    options and other formatting arguments are ignored. Types orjson does
+    not handle itself, datetimes included, go through Flask's default hook,
+    so responses carry the same values as with the standard provider."""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if kwargs.get('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+def init_json(app):
+    """Use orjson for request and response bodies when it is installed and
+    ``JSON_ORJSON`` is on."""
+    if orjson is not None and app.config.get('JSON_ORJSON', True):
+        app.json = OrjsonProvider(app)
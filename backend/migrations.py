@@ -0,0 +1,72 @@
+from sqlalchemy import inspect, text
+from database import db
+import logging
+
+logger = logging.getLogger(__name__)
+
+# New columns filled from an existing column when they are added.
+BACKFILL = {'updated_at': 'created_at'}
+
+def ensure_columns(engine=None):
+    """Add model columns missing from existing tables.
+
+    Only nullable columns without server defaults are handled, which covers
+    everything added to the models so far. Returns ``table.column`` names."""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c['name'] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                source = BACKFILL.get(column.name)
+                if source in existing:
+                    conn.execute(text(f'UPDATE {table.name} SET {column.name} = {source}'))
+                added.append(f'{table.name}.{column.name}')
+                logger.info(f'Added column {table.name}.{column.name}')
+    return added
+
+def ensure_indexes(engine=None):
+    """Create the model indexes missing from an existing database.
+
+    ``db.create_all()`` only builds indexes together with new tables, so
+    databases created before an index was declared need this step. Safe to
+    run repeatedly; returns the names of the indexes it created."""
+    engine = engine or db.engine
+    inspector = inspect(engine)
+    created = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+                created.append(index.name)
+                logger.info(f'Created index {index.name}')
+    return created
+
+def upgrade(engine=None):
+    """Bring an existing database up to the current models."""
+    from project_stats import rebuild_stats
+    from search import ensure_search_index
+    engine = engine or db.engine
+    new_stats = not inspect(engine).has_table('project_stats')
+    db.create_all()
+    changes = ensure_columns(engine) + ensure_indexes(engine) + ensure_search_index(engine)
+    if new_stats:
+        # The counters start empty; fill them from the existing tasks.
+        rebuild_stats()
+        changes.append('project_stats')
+    return changes
+
+if __name__ == '__main__':
+    from app import create_app
+    with create_app().app_context():
+        print(', '.join(upgrade()) or 'Database up to date')
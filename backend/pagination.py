@@ -0,0 +1,172 @@
+from flask import request, current_app, Response, stream_with_context
+from wire import render
+from datetime import datetime
+import base64
+import json
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+STREAM_BATCH = 1000
+
+class PaginationError(ValueError):
+    pass
+
+def encode_cursor(value, id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, column=None):
+    """The (sort value, id) pair from ``cursor``; the value is parsed back
+    into a datetime when ``column`` (created_at by default) holds dates."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        value, id = json.loads(raw)
+        is_date = column is None or column.type.python_type is datetime
+        if value is not None and is_date:
+            value = datetime.fromisoformat(value)
+        return value, int(id)
+    except (ValueError, TypeError, AttributeError):
+        raise PaginationError('Invalid cursor')
+
+def requested_sort(sorts, default='created_at'):
+    """The ``sort=`` parameter as (column, descending, nullable). ``sorts``
+    maps each allowed name to (column, nullable); a leading ``-`` sorts
+    descending. Nullable columns sort their NULLs last either way."""
+    sort = request.args.get('sort', default)
+    name = sort[1:] if sort.startswith('-') else sort
+    if name not in sorts:
+        raise PaginationError(f'sort must be one of {", ".join(sorts)}, optionally prefixed with -')
+    column, nullable = sorts[name]
+    return column, sort.startswith('-'), nullable
+
+def requested_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return {f.strip() for f in fields.split(',') if f.strip()}
+
+def requested_limit():
+    try:
+        limit = int(request.args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise PaginationError('limit must be an integer')
+    if limit < 1:
+        raise PaginationError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+def stream_format():
+    fmt = request.args.get('stream')
+    if fmt is None and request.accept_mimetypes.best == 'application/x-ndjson':
+        fmt = 'ndjson'
+    if fmt not in (None, 'json', 'ndjson'):
+        raise PaginationError('stream must be json or ndjson')
+    return fmt
+
+def columnar():
+    """True for ``shape=columns``: list keys sent once as ``columns`` and
+    each row as an array in that order, instead of an object per row."""
+    shape = request.args.get('shape', 'items')
+    if shape not in ('items', 'columns'):
+        raise PaginationError('shape must be items or columns')
+    return shape == 'columns'
+
+def _rows(serialize, rows, columns):
+    if columns:
+        return {'columns': serialize.columns, 'rows': serialize(rows, columnar=True)}
+    return {'items': serialize(rows)}
+
+def _stream(query, serialize, fmt, columns=False):
+    """Serialize rows as they are fetched, ``STREAM_BATCH`` at a time, so
+    memory stays flat no matter how many rows the export covers. Columnar
+    exports open with the column names: a ``columns`` key in JSON, the
+    first line in NDJSON."""
+    dumps = current_app.json.dumps
+    separator = '\n' if fmt == 'ndjson' else ','
+    if fmt == 'json':
+        opening, closing = '[', ']'
+        if columns:
+            opening, closing = f'{{"columns":{dumps(serialize.columns)},"rows":[', ']}'
+    else:
+        opening, closing = dumps(serialize.columns) if columns else '', '\n'
+
+    def encode(rows):
+        return separator.join(dumps(item, separators=(',', ':')) for item in serialize(rows, columns))
+
+    def generate():
+        yield opening
+        chunk, first = [], not (columns and fmt == 'ndjson')
+        for row in query.yield_per(STREAM_BATCH):
+            chunk.append(row)
+            if len(chunk) == STREAM_BATCH:
+                yield ('' if first else separator) + encode(chunk)
+                chunk, first = [], False
+        if chunk:
+            yield ('' if first else separator) + encode(chunk)
+        yield closing
+
+    mimetype = 'application/x-ndjson' if fmt == 'ndjson' else 'application/json'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+def _order_by(model, sort):
+    column, descending, nullable = sort
+    if descending:
+        first, second = column.desc(), model.id.desc()
+    else:
+        first, second = column.asc(), model.id.asc()
+    return (first.nulls_last() if nullable else first), second
+
+def _after(model, sort, value, id):
+    """Rows that come after (value, id) in ``sort`` order."""
+    column, descending, nullable = sort
+    later_id = model.id < id if descending else model.id > id
+    if value is None:
+        return column.is_(None) & later_id
+    later = (column < value if descending else column > value) | ((column == value) & later_id)
+    return (later | column.is_(None)) if nullable else later
+
+def paginate(query, model, serialize, sort=None, paged=False):
+    """Serialize ``query`` as a list, or as a keyset page on (sort column, id)
+    when the client sends ``limit`` or ``cursor``. ``query`` and
+    ``serialize`` come from a serializers.Schema; its rows must carry the
+    model's id and the sort column for building the next cursor. ``sort``
+    comes from requested_sort() and defaults to ascending created_at.
+    ``stream=json|ndjson`` exports every row as a streamed response instead.
+    ``paged`` always returns a page, for lists too long to ever send whole.
+    ``shape=columns`` sends rows as arrays (see columnar()), and clients
+    that accept application/msgpack get MessagePack."""
+    sort = sort or (model.created_at, False, False)
+    columns = columnar()
+
+    fmt = stream_format()
+    if fmt:
+        return _stream(query.order_by(*_order_by(model, sort)), serialize, fmt, columns)
+
+    if not paged and 'limit' not in request.args and 'cursor' not in request.args:
+        if 'sort' in request.args:
+            query = query.order_by(*_order_by(model, sort))
+        rows = query.all()
+        return render(_rows(serialize, rows, columns) if columns else serialize(rows))
+
+    limit = requested_limit()
+    query = query.order_by(*_order_by(model, sort))
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        value, id = decode_cursor(cursor, sort[0])
+        query = query.filter(_after(model, sort, value, id))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort[0].key), last.id)
+
+    return render({
+        **_rows(serialize, rows, columns),
+        'next_cursor': next_cursor
+    })
@@ -0,0 +1,128 @@
+from sqlalchemy import event, func, select, update, insert, delete, case
+from sqlalchemy.orm.attributes import get_history
+from database import db, Project, Task, ProjectStats
+import sys
+
+BUCKETS = ('todo', 'in_progress', 'done')
+
+def _recount(connection, project_id):
+    row = connection.execute(select(
+        func.count(Task.id),
+        *[func.coalesce(func.sum(case((Task.status == status, 1), else_=0)), 0) for status in BUCKETS]
+    ).where(Task.project_id == project_id)).one()
+    return dict(zip(('total',) + BUCKETS, row))
+
+def apply_deltas(connection, project_id, deltas):
+    """Add ``deltas`` ({'total': n, '<status>': n}) to a project's counters.
+
+    A project without a stats row (created before the table existed) gets
+    one from a recount, which already includes the change being applied."""
+    if project_id is None:
+        return
+    values = {name: getattr(ProjectStats, name) + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return
+    result = connection.execute(update(ProjectStats).where(ProjectStats.project_id == project_id).values(**values))
+    if result.rowcount == 0:
+        connection.execute(insert(ProjectStats).values(project_id=project_id, **_recount(connection, project_id)))
+
+def _deltas(status, sign):
+    deltas = {'total': sign}
+    if status in BUCKETS:
+        deltas[status] = sign
+    return deltas
+
+def apply_inserted(connection, rows):
+    """Counters for task rows inserted in bulk, one UPDATE per project."""
+    per_project = {}
+    for row in rows:
+        deltas = per_project.setdefault(row['project_id'], {'total': 0})
+        deltas['total'] += 1
+        status = row.get('status', 'todo')
+        if status in BUCKETS:
+            deltas[status] = deltas.get(status, 0) + 1
+    for project_id, deltas in per_project.items():
+        apply_deltas(connection, project_id, deltas)
+
+def apply_deleted(connection, project_id, status):
+    """Counters for a task removed with a core DELETE."""
+    apply_deltas(connection, project_id, _deltas(status, -1))
+
+@event.listens_for(Project, 'after_insert')
+def _project_created(mapper, connection, target):
+    connection.execute(insert(ProjectStats).values(project_id=target.id))
+
+@event.listens_for(Project, 'after_delete')
+def _project_deleted(mapper, connection, target):
+    connection.execute(delete(ProjectStats).where(ProjectStats.project_id == target.id))
+
+@event.listens_for(Task, 'after_insert')
+def _task_created(mapper, connection, target):
+    apply_deltas(connection, target.project_id, _deltas(target.status, 1))
+
+@event.listens_for(Task, 'after_delete')
+def _task_deleted(mapper, connection, target):
+    apply_deltas(connection, target.project_id, _deltas(target.status, -1))
+
+@event.listens_for(Task, 'after_update')
+def _task_updated(mapper, connection, target):
+    status = get_history(target, 'status')
+    project = get_history(target, 'project_id')
+    if not status.has_changes() and not project.has_changes():
+        return
+    old_status = status.deleted[0] if status.deleted else target.status
+    old_project = project.deleted[0] if project.deleted else target.project_id
+
+    if old_project == target.project_id:
+        deltas = _deltas(target.status, 1)
+        for name, delta in _deltas(old_status, -1).items():
+            deltas[name] = deltas.get(name, 0) + delta
+        apply_deltas(connection, target.project_id, deltas)
+    else:
+        apply_deltas(connection, old_project, _deltas(old_status, -1))
+        apply_deltas(connection, target.project_id, _deltas(target.status, 1))
+
+def _actual():
+    rows = db.session.execute(select(
+        Task.project_id, func.count(Task.id),
+        *[func.sum(case((Task.status == status, 1), else_=0)) for status in BUCKETS]
+    ).where(Task.project_id.isnot(None)).group_by(Task.project_id)).all()
+    return {row[0]: dict(zip(('total',) + BUCKETS, row[1:])) for row in rows}
+
+def verify_stats():
+    """Project ids whose stored counters differ from a recount, mapped to
+    (stored, actual). Projects without tasks or stats count as zero."""
+    zero = dict.fromkeys(('total',) + BUCKETS, 0)
+    actual = _actual()
+    stored = {s.project_id: {name: getattr(s, name) for name in zero} for s in ProjectStats.query.all()}
+    drift = {}
+    for project_id in set(actual) | set(stored):
+        have, want = stored.get(project_id, zero), actual.get(project_id, zero)
+        if have != want:
+            drift[project_id] = (have, want)
+    return drift
+
+def rebuild_stats():
+    """Recompute every project's counters from the task table."""
+    actual = _actual()
+    project_ids = db.session.execute(select(Project.id)).scalars().all()
+    zero = dict.fromkeys(('total',) + BUCKETS, 0)
+    db.session.execute(delete(ProjectStats))
+    if project_ids:
+        db.session.execute(insert(ProjectStats), [
+            {'project_id': project_id, **actual.get(project_id, zero)} for project_id in project_ids
+        ])
+    db.session.commit()
+    return len(project_ids)
+
+if __name__ == '__main__':
+    from app import create_app
+    with create_app().app_context():
+        if sys.argv[1:] == ['rebuild']:
+            print(f'Rebuilt stats for {rebuild_stats()} projects')
+        else:
+            drift = verify_stats()
+            for project_id, (have, want) in sorted(drift.items()):
+                print(f'project {project_id}: stored {have}, actual {want}')
+            print(f'{len(drift)} projects drifted' if drift else 'Project stats are consistent')
+            sys.exit(1 if drift else 0)
@@ -0,0 +1,78 @@
+from flask import has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import UpdateBase, event
+from threading import Lock
+import time
+
+REPLICA = 'replica'
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+MAX_WRITERS = 10000
+
+class StickyWrites:
+    """Users who wrote recently. Their reads stay on the primary until the
+    window has passed, so they do not see the replica lag behind their own
+    changes. Kept per worker process."""
+
+    def __init__(self, seconds=5):
+        self.seconds = seconds
+        self._until = {}
+        self._lock = Lock()
+
+    def configure(self, seconds):
+        self.seconds = seconds
+
+    def wrote(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._until) >= MAX_WRITERS:
+                self._until = {u: t for u, t in self._until.items() if t > now}
+            self._until[user_id] = now + self.seconds
+
+    def sticky(self, user_id):
+        until = self._until.get(user_id)
+        return until is not None and until > time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._until.clear()
+
+sticky_writes = StickyWrites()
+
+def _user_id():
+    try:
+        return get_jwt_identity()
+    except RuntimeError:
+        return None
+
+class RoutingSession(Session):
+    """db.session that sends reads to the ``replica`` bind when one is
+    configured.
+
+    Only GET/HEAD/OPTIONS requests read from the replica. Flushes and
+    INSERT/UPDATE/DELETE statements always go to the primary, and once a
+    session has written, the rest of its reads follow them there. After a
+    commit the writing user stays on the primary for
+    ``REPLICA_STICKY_SECONDS``. Work outside a request, such as migrations
+    and background jobs, uses the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and REPLICA in self._db.engines:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info['wrote'] = self.info['primary'] = True
+            elif self._reads_from_replica():
+                return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self):
+        if self.info.get('primary') or not has_request_context() or request.method not in READ_METHODS:
+            return False
+        user_id = _user_id()
+        return user_id is None or not sticky_writes.sticky(user_id)
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_writer(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        user_id = _user_id()
+        if user_id is not None:
+            sticky_writes.wrote(user_id)
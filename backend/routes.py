@@ -1,12 +1,44 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
-from database import db, User, Project, Task, Comment, UserStory
-from auth import hash_password, verify_password, role_required
-from ai_service import generate_user_stories
+from flask import Blueprint, Response, current_app, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from database import db, User, Project, Task, Comment
+from auth import hashing_pool, HashingBusy, needs_rehash, role_required, create_token, current_identity
+from ai_service import story_jobs
+from stats import dashboard_stats
+from scope import scope_projects, scope_tasks, visible_project_ids
+from events import feed, sse
+from admission import admission
+from wire import render
+from conditional import conditional, project_version, task_version, project_list_version, task_list_version
+from bulk import validate_tasks, insert_tasks, insert_user_stories, BulkValidationError
+from cascade import delete_project, delete_task
+from serializers import TASK, PROJECT, COMMENT, USER
+from pagination import paginate, requested_fields, requested_sort, requested_limit, encode_cursor, PaginationError
+from filters import filter_tasks, FilterError, TASK_SORTS, COMMENT_SORTS
+from search import search, KINDS
+from sqlalchemy import func
 from datetime import datetime, timedelta
 
 api = Blueprint('api', __name__)
 
+# Comments embedded in a task's detail; older ones come from /comments.
+LATEST_COMMENTS = 5
+
+@api.errorhandler(PaginationError)
+@api.errorhandler(FilterError)
+def query_error(error):
+    return {'error': str(error)}, 400
+
+@api.before_request
+def admit():
+    return admission.admit()
+
+@api.teardown_request
+def release_slot(error):
+    admission.release()
+
+def hashing_busy():
+    return {'error': 'Server busy, please retry'}, 503, {'Retry-After': '1'}
+
 @api.route('/register', methods=['POST'])
 def register():
     try:
@@ -27,12 +59,14 @@ def register():
 
         user = User(
             username=data['username'],
-            password=hash_password(data['password']),
+            password=hashing_pool.hash(data['password']),
             role=data.get('role', 'developer')
         )
         db.session.add(user)
         db.session.commit()
         return {'message': 'User created successfully', 'id': user.id}, 201
+    except HashingBusy:
+        return hashing_busy()
     except Exception as e:
         db.session.rollback()
         return {'error': 'Registration failed'}, 500
@@ -52,22 +86,33 @@ def login():
             
         user = User.query.filter_by(username=username).first()
 
-        if not user or not verify_password(password, user.password):
+        if not user or not hashing_pool.verify(password, user.password):
             return {'error': 'Invalid credentials'}, 401
 
-        token = create_access_token(identity=str(user.id), expires_delta=timedelta(days=1))
+        if needs_rehash(user.password):
+            # The password is already verified; a busy pool only postpones
+            # the upgrade to the next login.
+            try:
+                user.password = hashing_pool.hash(password)
+                db.session.commit()
+            except HashingBusy:
+                pass
+
+        token = create_token(user, expires_delta=timedelta(days=1))
         return {
             'token': token,
             'user': {'id': user.id, 'username': user.username, 'role': user.role}
         }, 200
+    except HashingBusy:
+        return hashing_busy()
     except Exception as e:
         return {'error': 'Login failed'}, 500
 
 @api.route('/projects', methods=['GET', 'POST'])
 @jwt_required()
 def projects():
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = current_identity()
+    user_id = user.id
 
     if request.method == 'POST':
         data = request.json
@@ -78,23 +123,13 @@ def projects():
         )
         db.session.add(project)
         db.session.commit()
+        feed.publish('project.created', id=project.id, project_id=project.id, created_by=user_id)
         return {'id': project.id, 'name': project.name}, 201
 
-    if user.role == 'admin':
-        projects = Project.query.all()
-    else:
-        projects = Project.query.filter(
-            (Project.created_by == user_id) | (Project.team_members.contains(user))
-        ).all()
-
-    return jsonify([{
-        'id': p.id,
-        'name': p.name,
-        'description': p.description,
-        'status': p.status,
-        'task_count': len(p.tasks),
-        'team_members': [{'id': m.id, 'username': m.username} for m in p.team_members]
-    } for p in projects])
+    query, serialize = PROJECT.query(requested_fields(), keys=(Project.created_at,))
+    query = scope_projects(query, user)
+
+    return conditional(project_list_version(user), lambda: paginate(query, Project, serialize))
 
 @api.route('/projects/<int:id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
@@ -102,8 +137,9 @@ def project_detail(id):
     project = Project.query.get_or_404(id)
 
     if request.method == 'DELETE':
-        db.session.delete(project)
+        delete_project(project)
         db.session.commit()
+        feed.publish('project.deleted', id=id, project_id=id)
         return '', 204
 
     if request.method == 'PUT':
@@ -112,7 +148,12 @@ def project_detail(id):
         project.description = data.get('description', project.description)
         project.status = data.get('status', project.status)
         db.session.commit()
+        feed.publish('project.updated', id=id, project_id=id)
+        return project_payload(project)
+
+    return conditional(project_version(project), lambda: project_payload(project))
 
+def project_payload(project):
     return {
         'id': project.id,
         'name': project.name,
@@ -140,14 +181,28 @@ def add_member(id):
     user = User.query.get(data['user_id'])
     if user and user not in project.team_members:
         project.team_members.append(user)
+        project.updated_at = datetime.utcnow()
         db.session.commit()
+        feed.publish('project.member_added', id=id, project_id=id, user_id=user.id)
     return {'message': 'Member added'}, 200
 
+@api.route('/projects/<int:id>/user-stories', methods=['POST'])
+@jwt_required()
+def add_user_stories(id):
+    Project.query.get_or_404(id)
+    stories = (request.json or {}).get('stories')
+    if not isinstance(stories, list) or not stories or \
+            not all(isinstance(story, str) and story.strip() for story in stories):
+        return {'error': 'stories must be a non-empty list of strings'}, 400
+
+    ids = insert_user_stories(id, [story.strip() for story in stories])
+    db.session.commit()
+    return {'ids': ids}, 201
+
 @api.route('/tasks', methods=['GET', 'POST'])
 @jwt_required()
 def tasks():
-    user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = current_identity()
 
     if request.method == 'POST':
         data = request.json
@@ -160,30 +215,29 @@ def tasks():
         )
         db.session.add(task)
         db.session.commit()
+        publish_task('task.created', task.id, task.project_id, task.assigned_to)
         return {'id': task.id, 'title': task.title}, 201
 
-    if user.role == 'admin':
-        tasks = Task.query.all()
-    elif user.role == 'manager':
-        projects = Project.query.filter(
-            (Project.created_by == user_id) | (Project.team_members.contains(user))
-        ).all()
-        project_ids = [p.id for p in projects]
-        tasks = Task.query.filter(Task.project_id.in_(project_ids)).all()
-    else:
-        tasks = Task.query.filter_by(assigned_to=user_id).all()
-
-    return jsonify([{
-        'id': t.id,
-        'title': t.title,
-        'status': t.status,
-        'project_id': t.project_id,
-        'project_name': t.project.name if t.project else None,
-        'assigned_to': t.assigned_to,
-        'assignee_name': t.assignee.username if t.assignee else None,
-        'deadline': t.deadline.isoformat() if t.deadline else None,
-        'overdue': t.deadline < datetime.utcnow() if t.deadline and t.status != 'done' else False
-    } for t in tasks])
+    now = datetime.utcnow()
+    sort = requested_sort(TASK_SORTS)
+    query, serialize = TASK.query(requested_fields(), keys=(sort[0],), now=now)
+    query = filter_tasks(scope_tasks(query, user), request.args, now)
+
+    return conditional(task_list_version(user), lambda: paginate(query, Task, serialize, sort=sort))
+
+@api.route('/tasks/bulk', methods=['POST'])
+@jwt_required()
+def bulk_tasks():
+    try:
+        rows = validate_tasks(request.json)
+    except BulkValidationError as e:
+        return {'error': 'Invalid tasks', 'details': e.errors}, 400
+
+    ids = insert_tasks(rows)
+    db.session.commit()
+    for id, row in zip(ids, rows):
+        publish_task('task.created', id, row['project_id'], row['assigned_to'])
+    return {'ids': ids}, 201
 
 @api.route('/tasks/<int:id>', methods=['GET', 'PUT', 'DELETE'])
 @jwt_required()
@@ -191,8 +245,10 @@ def task_detail(id):
     task = Task.query.get_or_404(id)
 
     if request.method == 'DELETE':
-        db.session.delete(task)
+        project_id, assigned_to = task.project_id, task.assigned_to
+        delete_task(task)
         db.session.commit()
+        publish_task('task.deleted', id, project_id, assigned_to)
         return '', 204
 
     if request.method == 'PUT':
@@ -204,6 +260,26 @@ def task_detail(id):
         if data.get('deadline'):
             task.deadline = datetime.fromisoformat(data['deadline'])
         db.session.commit()
+        publish_task('task.updated', id, task.project_id, task.assigned_to)
+        return task_payload(task)
+
+    return conditional(task_version(task), lambda: task_payload(task))
+
+def publish_task(type, id, project_id, assigned_to):
+    feed.publish(type, id=id, project_id=project_id, assigned_to=assigned_to)
+
+def task_payload(task):
+    # The newest comments, their authors and the total count in one query;
+    # count(*) OVER () is evaluated before the LIMIT.
+    query, serialize = COMMENT.query()
+    rows = query.add_columns(func.count().over().label('total')) \
+        .filter(Comment.task_id == task.id) \
+        .order_by(Comment.created_at.desc(), Comment.id.desc()) \
+        .limit(LATEST_COMMENTS).all()
+    comment_count = rows[0].total if rows else 0
+    older = None
+    if comment_count > len(rows):
+        older = encode_cursor(rows[-1].created_at, rows[-1].id)
 
     return {
         'id': task.id,
@@ -212,17 +288,20 @@ def task_detail(id):
         'status': task.status,
         'deadline': task.deadline.isoformat() if task.deadline else None,
         'assigned_to': task.assigned_to,
-        'comments': [{
-            'id': c.id,
-            'content': c.content,
-            'user': c.user.username,
-            'created_at': c.created_at.isoformat()
-        } for c in task.comments]
+        'comment_count': comment_count,
+        'comments': serialize(rows),
+        'comments_cursor': older
     }
 
-@api.route('/tasks/<int:id>/comments', methods=['POST'])
+@api.route('/tasks/<int:id>/comments', methods=['GET', 'POST'])
 @jwt_required()
-def add_comment(id):
+def task_comments(id):
+    task = Task.query.get_or_404(id)
+    if request.method == 'GET':
+        sort = requested_sort(COMMENT_SORTS, default='-created_at')
+        query, serialize = COMMENT.query(requested_fields(), keys=(sort[0],))
+        return paginate(query.filter(Comment.task_id == id), Comment, serialize, sort=sort, paged=True)
+
     data = request.json
     comment = Comment(
         content=data['content'],
@@ -231,57 +310,57 @@ def add_comment(id):
     )
     db.session.add(comment)
     db.session.commit()
+    feed.publish('comment.created', id=comment.id, task_id=id,
+                 project_id=task.project_id, assigned_to=task.assigned_to)
     return {'id': comment.id}, 201
 
+@api.route('/search', methods=['GET'])
+@jwt_required()
+def search_endpoint():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return {'error': 'q is required'}, 400
+    kinds = request.args.get('types')
+    kinds = [k.strip() for k in kinds.split(',') if k.strip()] if kinds else KINDS
+    if not kinds or any(k not in KINDS for k in kinds):
+        return {'error': f'types must be drawn from {", ".join(KINDS)}'}, 400
+    return search(current_identity(), q, kinds, requested_limit(), request.args.get('cursor'))
+
 @api.route('/dashboard', methods=['GET'])
 @jwt_required()
 def dashboard():
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get_or_404(user_id)
-
-        if user.role == 'admin':
-            tasks = Task.query.all()
-            projects = Project.query.all()
-        elif user.role == 'manager':
-            projects = Project.query.filter(
-                (Project.created_by == user_id) | (Project.team_members.contains(user))
-            ).all()
-            project_ids = [p.id for p in projects]
-            tasks = Task.query.filter(Task.project_id.in_(project_ids)).all()
-        else:
-            tasks = Task.query.filter_by(assigned_to=user_id).all()
-            projects = Project.query.filter(Project.team_members.contains(user)).all()
-
-        overdue = [t for t in tasks if t.deadline and t.deadline < datetime.utcnow() and t.status != 'done']
-
-        return {
-            'stats': {
-                'total_projects': len(projects),
-                'total_tasks': len(tasks),
-                'todo': len([t for t in tasks if t.status == 'todo']),
-                'in_progress': len([t for t in tasks if t.status == 'in_progress']),
-                'done': len([t for t in tasks if t.status == 'done']),
-                'overdue': len(overdue)
-            },
-            'recent_tasks': [{
-                'id': t.id,
-                'title': t.title,
-                'status': t.status,
-                'project': t.project.name if t.project else None,
-                'deadline': t.deadline.isoformat() if t.deadline else None
-            } for t in sorted(tasks, key=lambda x: x.created_at, reverse=True)[:5]],
-            'overdue_tasks': [{
-                'id': t.id,
-                'title': t.title,
-                'project': t.project.name if t.project else None,
-                'deadline': t.deadline.isoformat() if t.deadline else None
-            } for t in overdue[:5]]
-        }
+        return render(dashboard_stats(current_identity()))
     except Exception as e:
         print(f"Error in dashboard: {e}")
         return {'error': str(e)}, 500
 
+@api.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def events():
+    """Server-Sent Events stream of the changes the caller may see.
+    EventSource cannot set headers, so the token may also come as ?jwt=."""
+    user = current_identity()
+    project_ids = [] if user.role == 'admin' else \
+        db.session.execute(visible_project_ids(user)).scalars().all()
+    subscription = feed.subscribe(user, project_ids)
+    heartbeat = current_app.config['EVENTS_HEARTBEAT']
+
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                event = subscription.next(timeout=heartbeat)
+                yield sse(event) if event else ': keepalive\n\n'
+        finally:
+            feed.unsubscribe(subscription)
+
+    # Not stream_with_context: the stream can stay open for hours and must
+    # not hold the request's database session while it does. Its admission
+    # slot is held for as long, so open streams stay capped.
+    return admission.hold(Response(generate(), mimetype='text/event-stream',
+                                   headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}))
+
 @api.route('/ai/generate-user-stories', methods=['POST'])
 def generate_stories():
     data = request.json
@@ -291,32 +370,39 @@ def generate_stories():
     if not description:
         return {'error': 'Description required'}, 400
 
-    result = generate_user_stories(description)
-    
-    if isinstance(result, tuple):
-        content, status_code = result
-        if status_code != 200:
-            return content, status_code
-        stories = content
-    else:
-        # Fallback for old format
-        stories = result
+    job = story_jobs.submit(description)
+    if not job.wait(timeout=60):
+        return {'error': 'AI service timed out', 'job_id': job.id}, 504
+    if job.status_code != 200:
+        return job.result, job.status_code
+    stories = job.result
 
     if project_id:
-        for story in stories:
-            user_story = UserStory(project_id=project_id, story=story)
-            db.session.add(user_story)
+        insert_user_stories(project_id, stories)
         db.session.commit()
 
     return jsonify(stories), 200
 
+@api.route('/ai/jobs', methods=['POST'])
+def create_story_job():
+    data = request.json or {}
+    description = data.get('projectDescription', '')
+    if not description or not description.strip():
+        return {'error': 'Description required'}, 400
+
+    job = story_jobs.submit(description)
+    return job.to_dict(), 200 if job.status == 'done' else 202
+
+@api.route('/ai/jobs/<job_id>', methods=['GET'])
+def story_job(job_id):
+    job = story_jobs.get(job_id)
+    if job is None:
+        return {'error': 'Job not found'}, 404
+    return job.to_dict(), 200
+
 @api.route('/users', methods=['GET'])
 @jwt_required()
 @role_required(['admin', 'manager'])
 def users():
-    users = User.query.all()
-    return jsonify([{
-        'id': u.id,
-        'username': u.username,
-        'role': u.role
-    } for u in users])
+    query, serialize = USER.query(requested_fields(), keys=(User.created_at,))
+    return paginate(query, User, serialize)
@@ -0,0 +1,24 @@
+from sqlalchemy import select, union
+from database import Project, Task, project_members
+
+def visible_project_ids(user):
+    """Ids of the projects ``user`` created or is a member of, as a subquery.
+
+    Keeps visibility inside the SQL statement instead of round-tripping a
+    list of ids, so cost does not grow with the number of memberships."""
+    return union(
+        select(Project.id).where(Project.created_by == user.id),
+        select(project_members.c.project_id).where(project_members.c.user_id == user.id)
+    )
+
+def scope_projects(query, user, column=Project.id):
+    if user.role == 'admin':
+        return query
+    return query.filter(column.in_(visible_project_ids(user)))
+
+def scope_tasks(query, user):
+    if user.role == 'admin':
+        return query
+    if user.role == 'manager':
+        return query.filter(Task.project_id.in_(visible_project_ids(user)))
+    return query.filter(Task.assigned_to == user.id)
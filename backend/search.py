@@ -0,0 +1,166 @@
+from sqlalchemy import DDL, Float, cast, event, func, inspect, literal, literal_column, union_all
+from sqlalchemy.sql import table, column
+from database import db, Task, Comment, UserStory
+from scope import scope_projects, scope_tasks
+from pagination import PaginationError
+import base64
+import json
+import re
+
+KINDS = ('task', 'comment', 'user_story')
+
+# SQLite: FTS5 tables over the source tables' own rows (external content),
+# kept in step by triggers so every write path, bulk inserts included,
+# updates the index. Postgres: GIN indexes on the same tsvector expressions
+# the search query uses, which the database maintains by itself.
+SQLITE_DDL = {
+    'task': ('task_fts', 'title, description'),
+    'comment': ('comment_fts', 'content'),
+    'user_story': ('user_story_fts', 'story'),
+}
+
+POSTGRES_DDL = {
+    'task': "CREATE INDEX IF NOT EXISTS ix_task_search ON task USING GIN "
+            "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(description, '')))",
+    'comment': "CREATE INDEX IF NOT EXISTS ix_comment_search ON comment USING GIN "
+               "(to_tsvector('english', content))",
+    'user_story': "CREATE INDEX IF NOT EXISTS ix_user_story_search ON user_story USING GIN "
+                  "(to_tsvector('english', story))",
+}
+
+def _sqlite_statements(source):
+    fts, columns = SQLITE_DDL[source]
+    new = ', '.join(f'new.{c.strip()}' for c in columns.split(','))
+    old = ', '.join(f'old.{c.strip()}' for c in columns.split(','))
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, content='{source}', content_rowid='id')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} BEGIN "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old}); "
+        f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new}); END",
+    ]
+
+for _model in (Task, Comment, UserStory):
+    _source = _model.__tablename__
+    for _statement in _sqlite_statements(_source):
+        event.listen(_model.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+    event.listen(_model.__table__, 'after_create', DDL(POSTGRES_DDL[_source]).execute_if(dialect='postgresql'))
+    event.listen(_model.__table__, 'before_drop',
+                 DDL(f'DROP TABLE IF EXISTS {SQLITE_DDL[_source][0]}').execute_if(dialect='sqlite'))
+
+def ensure_search_index(engine=None):
+    """Create the search index for databases whose tables predate it and
+    fill it from the existing rows. Returns the names it created."""
+    engine = engine or db.engine
+    created = []
+    with engine.begin() as conn:
+        if engine.dialect.name == 'sqlite':
+            existing = set(inspect(conn).get_table_names())
+            for source, (fts, _) in SQLITE_DDL.items():
+                if fts in existing:
+                    continue
+                for statement in _sqlite_statements(source):
+                    conn.exec_driver_sql(statement)
+                conn.exec_driver_sql(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+                created.append(fts)
+        elif engine.dialect.name == 'postgresql':
+            for source, statement in POSTGRES_DDL.items():
+                existing = {ix['name'] for ix in inspect(conn).get_indexes(source)}
+                name = f'ix_{source}_search'
+                if name not in existing:
+                    conn.exec_driver_sql(statement)
+                    created.append(name)
+    return created
+
+def fts_query(text):
+    """Quote every word so user input can never be read as FTS5 syntax.
+    Terms are ANDed; a trailing ``*`` keeps prefix matching."""
+    terms = re.findall(r'\w+\*?', text)
+    return ' '.join(f'"{t.rstrip("*")}"' + ('*' if t.endswith('*') else '') for t in terms)
+
+def _english(*columns):
+    text = columns[0] if len(columns) == 1 else \
+        func.coalesce(columns[0], '') + literal_column("' '") + func.coalesce(columns[1], '')
+    return func.to_tsvector(literal_column("'english'"), text)
+
+def _match(dialect, model, fts, weights, columns, q):
+    """Matching rows of ``model`` and their score (lower ranks first)."""
+    query = db.session.query
+    if dialect == 'sqlite':
+        index = table(fts, column('rowid'))
+        name = literal_column(fts)
+        return lambda *cols: query(*cols).select_from(index).join(model, model.id == index.c.rowid) \
+            .filter(name.op('MATCH')(fts_query(q))), func.bm25(name, *weights)
+    vector = _english(*columns)
+    tsquery = func.plainto_tsquery(literal_column("'english'"), q)
+    # ts_rank is a float4; widened to double here, the score round-trips
+    # through the cursor and compares equal to itself on the next page.
+    return lambda *cols: query(*cols).select_from(model).filter(vector.op('@@')(tsquery)), \
+        cast(-func.ts_rank(vector, tsquery), Float(53))
+
+def _sources(user, q, kinds):
+    dialect = db.session.get_bind().dialect.name
+    queries = []
+    if 'task' in kinds:
+        rows, score = _match(dialect, Task, 'task_fts', (2.0, 1.0), (Task.title, Task.description), q)
+        queries.append(scope_tasks(rows(
+            literal('task').label('kind'), Task.id.label('id'), Task.id.label('task_id'),
+            Task.project_id.label('project_id'), Task.title.label('text'), score.label('score')), user))
+    if 'comment' in kinds:
+        rows, score = _match(dialect, Comment, 'comment_fts', (), (Comment.content,), q)
+        queries.append(scope_tasks(rows(
+            literal('comment').label('kind'), Comment.id.label('id'), Comment.task_id.label('task_id'),
+            Task.project_id.label('project_id'), Comment.content.label('text'), score.label('score'))
+            .join(Task, Task.id == Comment.task_id), user))
+    if 'user_story' in kinds:
+        rows, score = _match(dialect, UserStory, 'user_story_fts', (), (UserStory.story,), q)
+        queries.append(scope_projects(rows(
+            literal('user_story').label('kind'), UserStory.id.label('id'), literal(None).label('task_id'),
+            UserStory.project_id.label('project_id'), UserStory.story.label('text'), score.label('score')),
+            user, UserStory.project_id))
+    return queries
+
+def _encode(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii').rstrip('=')
+
+def _decode(cursor):
+    try:
+        score, kind, id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return float(score), str(kind), int(id)
+    except (ValueError, TypeError):
+        raise PaginationError('Invalid cursor')
+
+def search(user, q, kinds=KINDS, limit=20, cursor=None):
+    """Best matches for ``q`` among the tasks, comments and user stories
+    ``user`` may see, best first, as a keyset page on (score, kind, id)."""
+    if not fts_query(q):
+        return {'items': [], 'next_cursor': None}
+
+    hits = union_all(*[query.statement for query in _sources(user, q, kinds)]).subquery()
+    query = db.session.query(hits).order_by(hits.c.score, hits.c.kind, hits.c.id)
+    if cursor:
+        score, kind, id = _decode(cursor)
+        query = query.filter((hits.c.score > score) | ((hits.c.score == score) & (
+            (hits.c.kind > kind) | ((hits.c.kind == kind) & (hits.c.id > id)))))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode([last.score, last.kind, last.id])
+
+    return {
+        'items': [{
+            'type': row.kind,
+            'id': row.id,
+            'task_id': row.task_id,
+            'project_id': row.project_id,
+            'text': row.text,
+            'score': row.score
+        } for row in rows],
+        'next_cursor': next_cursor
+    }
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from sqlalchemy import case, func
+from sqlalchemy.orm import aliased
+from database import db, User, Project, ProjectStats, Task, Comment, project_members
+from filters import overdue
+
+def iso(value):
+    return value.isoformat() if value else None
+
+class Field:
+    """One output key: the SQL expression that produces it (or ``compute``,
+    a function of the query parameters returning one), an optional Python
+    transform for the fetched value, and the (target, onclause) outer join
+    the expression needs."""
+    __slots__ = ('expression', 'compute', 'transform', 'join')
+
+    def __init__(self, expression=None, transform=None, join=None, compute=None):
+        self.expression = expression
+        self.compute = compute
+        self.transform = transform
+        self.join = join
+
+class Related:
+    """A to-many output key, loaded for a whole batch of rows at once:
+    ``load(ids)`` returns {row id: value}."""
+    __slots__ = ('load',)
+
+    def __init__(self, load):
+        self.load = load
+
+class Schema:
+    """Turns the fields a client asked for into a query over just those
+    columns plus a serializer for its rows.
+
+    Rows come back as plain tuples instead of ORM instances, so nothing is
+    tracked by the session or lazily loaded. The serializer is built once
+    per request: for each batch it zips the tuple with the output names,
+    applies the few transforms in place, and fills related keys with one
+    query per batch."""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = {name: field if isinstance(field, (Field, Related)) else Field(field)
+                       for name, field in fields.items()}
+
+    def query(self, fields=None, keys=(), **params):
+        """(query, serialize) for ``fields`` (all when None). ``keys`` are
+        columns the caller needs on every row, such as the sort column for
+        cursors; the model's id is always included."""
+        names, columns, transforms, related, joins = [], [], [], [], {}
+        for name, field in self.fields.items():
+            if fields is not None and name not in fields:
+                continue
+            if isinstance(field, Related):
+                related.append((name, field.load))
+                continue
+            expression = field.compute(**params) if field.compute else field.expression
+            if field.transform:
+                transforms.append((len(names), field.transform))
+            if field.join:
+                joins.setdefault(id(field.join[0]), field.join)
+            names.append(name)
+            columns.append(expression.label(name))
+
+        for key in (self.model.id,) + tuple(keys):
+            if key.key not in names:
+                columns.append(key.label(key.key))
+
+        query = db.session.query(*columns).select_from(self.model)
+        for target, onclause in joins.values():
+            query = query.outerjoin(target, onclause)
+
+        width = len(names)
+
+        def serialize(rows, columnar=False):
+            """Dicts keyed by output name, or with ``columnar`` bare lists
+            in the order of ``serialize.columns``."""
+            items = []
+            for row in rows:
+                values = list(row[:width])
+                for index, transform in transforms:
+                    values[index] = transform(values[index])
+                items.append(values if columnar else dict(zip(names, values)))
+            for name, load in related:
+                loaded = load([row.id for row in rows])
+                for item, row in zip(items, rows):
+                    if columnar:
+                        item.append(loaded.get(row.id, []))
+                    else:
+                        item[name] = loaded.get(row.id, [])
+            return items
+
+        serialize.columns = names + [name for name, _ in related]
+        return query, serialize
+
+_task_project = aliased(Project, name='task_project')
+_assignee = aliased(User, name='assignee')
+_author = aliased(User, name='author')
+
+TASK = Schema(Task, {
+    'id': Task.id,
+    'title': Task.title,
+    'status': Task.status,
+    'project_id': Task.project_id,
+    'project_name': Field(_task_project.name, join=(_task_project, Task.project_id == _task_project.id)),
+    'assigned_to': Task.assigned_to,
+    'assignee_name': Field(_assignee.username, join=(_assignee, Task.assigned_to == _assignee.id)),
+    'deadline': Field(Task.deadline, iso),
+    'overdue': Field(compute=lambda now: case((overdue(now), True), else_=False), transform=bool),
+})
+
+def _team_members(project_ids):
+    rows = db.session.query(project_members.c.project_id, User.id, User.username) \
+        .join(User, User.id == project_members.c.user_id) \
+        .filter(project_members.c.project_id.in_(project_ids)).all()
+    members = defaultdict(list)
+    for project_id, id, username in rows:
+        members[project_id].append({'id': id, 'username': username})
+    return members
+
+PROJECT = Schema(Project, {
+    'id': Project.id,
+    'name': Project.name,
+    'description': Project.description,
+    'status': Project.status,
+    'task_count': Field(func.coalesce(ProjectStats.total, 0),
+                        join=(ProjectStats, ProjectStats.project_id == Project.id)),
+    'team_members': Related(_team_members),
+})
+
+COMMENT = Schema(Comment, {
+    'id': Comment.id,
+    'content': Comment.content,
+    'user_id': Comment.user_id,
+    'user': Field(_author.username, join=(_author, Comment.user_id == _author.id)),
+    'created_at': Field(Comment.created_at, iso),
+})
+
+USER = Schema(User, {
+    'id': User.id,
+    'username': User.username,
+    'role': User.role,
+})
@@ -0,0 +1,66 @@
+from sqlalchemy import func
+from database import db, Project, ProjectStats, Task
+from scope import scope_projects, scope_tasks
+from filters import overdue
+from datetime import datetime
+
+def _grouped(query):
+    counts = dict(query.group_by(Task.status).all())
+    return dict(counts, total=sum(counts.values()))
+
+def _status_counts(user):
+    """Task totals per status. Admins and managers see whole projects, so
+    their totals are sums over the per-project counters; developers see only
+    their own assignments, which the (assigned_to, status) index answers.
+    Admins also see tasks without a project, which have no counters and are
+    counted from the project_id index."""
+    counts_query = db.session.query(Task.status, func.count(Task.id))
+    if user.role not in ('admin', 'manager'):
+        return _grouped(scope_tasks(counts_query, user))
+
+    columns = ('total', 'todo', 'in_progress', 'done')
+    sums = scope_projects(db.session.query(
+        *[func.coalesce(func.sum(getattr(ProjectStats, name)), 0) for name in columns]
+    ), user, ProjectStats.project_id).one()
+    counts = dict(zip(columns, sums))
+    if user.role == 'admin':
+        for status, count in _grouped(counts_query.filter(Task.project_id.is_(None))).items():
+            counts[status] = counts.get(status, 0) + count
+    return counts
+
+def dashboard_stats(user, limit=5):
+    now = datetime.utcnow()
+
+    status_counts = _status_counts(user)
+    overdue_count = scope_tasks(db.session.query(func.count(Task.id)), user).filter(overdue(now)).scalar()
+    total_projects = scope_projects(db.session.query(func.count(Project.id)), user).scalar()
+
+    rows = db.session.query(Task.id, Task.title, Task.status, Task.deadline, Project.name) \
+        .outerjoin(Project, Task.project_id == Project.id)
+
+    recent = scope_tasks(rows, user).order_by(Task.created_at.desc(), Task.id.desc()).limit(limit).all()
+    overdue_rows = scope_tasks(rows, user).filter(overdue(now)).order_by(Task.id).limit(limit).all()
+
+    return {
+        'stats': {
+            'total_projects': total_projects,
+            'total_tasks': status_counts['total'],
+            'todo': status_counts.get('todo', 0),
+            'in_progress': status_counts.get('in_progress', 0),
+            'done': status_counts.get('done', 0),
+            'overdue': overdue_count
+        },
+        'recent_tasks': [{
+            'id': t.id,
+            'title': t.title,
+            'status': t.status,
+            'project': t.name,
+            'deadline': t.deadline.isoformat() if t.deadline else None
+        } for t in recent],
+        'overdue_tasks': [{
+            'id': t.id,
+            'title': t.title,
+            'project': t.name,
+            'deadline': t.deadline.isoformat() if t.deadline else None
+        } for t in overdue_rows]
+    }
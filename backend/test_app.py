@@ -1,29 +1,44 @@
 import unittest
+from unittest import mock
+import importlib.util
 import json
 import os
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
-from flask_jwt_extended import JWTManager
-from flask_cors import CORS
-from database import User, Project, Task, Comment, UserStory
-from auth import hash_password, verify_password, role_required
-from ai_service import generate_user_stories
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from sqlalchemy import event, text
+from app import create_app
+from database import db, User, Project, Task, Comment, UserStory
+from auth import hash_password, verify_password, identity_cache, hashing_pool, HashingBusy
+import ai_service
+from ai_service import story_jobs
+from events import feed
+from admission import admission
+from types import SimpleNamespace
 from datetime import datetime, timedelta
 
-def create_test_app():
-    test_app = Flask(__name__)
-    test_app.config['TESTING'] = True
-    test_app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    test_app.config['JWT_SECRET_KEY'] = 'test-secret-key'
-    test_app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+class FakeGroqClient:
+    """Stands in for the Groq client so AI tests run offline."""
+
+    def __init__(self, release=None):
+        self.calls = 0
+        self.release = release
+        self.chat = SimpleNamespace(completions=self)
 
-    from database import db
-    db.init_app(test_app)
-    jwt = JWTManager(test_app)
-    CORS(test_app)
+    def create(self, **kwargs):
+        self.calls += 1
+        if self.release:
+            self.release.wait(5)
+        content = 'As a user, I want to add tasks, so that I remember them.\nAs a user, I want to complete tasks, so that I see progress.'
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
 
-    from routes import api
-    test_app.register_blueprint(api, url_prefix='/api')
+def create_test_app():
+    test_app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'JWT_SECRET_KEY': 'test-secret-key',
+        'BCRYPT_ROUNDS': 4
+    })
 
     with test_app.app_context():
         db.create_all()
@@ -34,6 +49,8 @@ class ProjectManagementTestCase(unittest.TestCase):
     def setUp(self):
         self.app, self.db = create_test_app()
         self.client = self.app.test_client()
+        self.real_ai_client = ai_service.client
+        self.fake_ai = ai_service.client = FakeGroqClient()
 
         with self.app.app_context():
             import time
@@ -55,10 +72,45 @@ class ProjectManagementTestCase(unittest.TestCase):
 
     def tearDown(self):
         """Clean up after each test."""
+        identity_cache.clear()
+        hashing_pool.shutdown()
+        story_jobs.clear()
+        feed.clear()
+        admission.clear()
+        ai_service.client = self.real_ai_client
         with self.app.app_context():
             self.db.session.remove()
             self.db.drop_all()
 
+    @contextmanager
+    def count_queries(self):
+        """Collect the SQL statements issued against the test engine."""
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+    def seed_projects(self, count, tasks_per_project):
+        with self.app.app_context():
+            members = User.query.all()
+            for i in range(count):
+                project = Project(name=f'Seed {i}', created_by=self.manager_id, team_members=members)
+                self.db.session.add(project)
+                self.db.session.flush()
+                self.db.session.add_all([
+                    Task(title=f'Seed {i}.{j}', project_id=project.id, assigned_to=self.developer_id)
+                    for j in range(tasks_per_project)
+                ])
+            self.db.session.commit()
+
     def login_user(self, username, password):
         """Helper method to login and get JWT token."""
         response = self.client.post('/api/login',
@@ -123,6 +175,122 @@ class ProjectManagementTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIn('error', data)
 
+    def test_login_rehashes_on_cost_change(self):
+        self.app.config['BCRYPT_ROUNDS'] = 5
+        self.assertIsNotNone(self.login_user(self.admin_username, 'admin123'))
+
+        with self.app.app_context():
+            stored = self.db.session.get(User, self.admin_id).password
+        self.assertTrue(stored.startswith('$2b$05$'))
+        self.assertTrue(verify_password('admin123', stored))
+
+    def test_login_skips_rehash_when_hashing_pool_full(self):
+        self.app.config['BCRYPT_ROUNDS'] = 5
+        with mock.patch.object(hashing_pool, 'hash', side_effect=HashingBusy):
+            self.assertIsNotNone(self.login_user(self.admin_username, 'admin123'))
+
+        with self.app.app_context():
+            self.assertTrue(self.db.session.get(User, self.admin_id).password.startswith('$2b$04$'))
+
+    def test_login_rejected_when_hashing_pool_full(self):
+        self.app.config.update(HASH_WORKERS=1, HASH_QUEUE_LIMIT=0)
+        release = threading.Event()
+        with self.app.app_context():
+            hashing_pool.submit(release.wait)
+
+        response = self.client.post('/api/login',
+                                data=json.dumps({'username': self.admin_username, 'password': 'admin123'}),
+                                content_type='application/json')
+        release.set()
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+    def test_admission_sheds_by_rate_and_concurrency(self):
+        from admission import admission, shed_requests, MemoryStore
+        admission.configure(MemoryStore(), {'api.dashboard': {'concurrency': 1, 'rate': 0.5, 'burst': 2}})
+        admin = {'Authorization': f"Bearer {self.login_user(self.admin_username, 'admin123')}"}
+        manager = {'Authorization': f"Bearer {self.login_user(self.manager_username, 'manager123')}"}
+        rate_shed = shed_requests.value('api.dashboard', 'rate')
+
+        statuses = [self.client.get('/api/dashboard', headers=admin).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.get('/api/dashboard', headers=admin)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertEqual(shed_requests.value('api.dashboard', 'rate'), rate_shed + 2)
+        self.assertEqual(self.client.get('/api/dashboard', headers=manager).status_code, 200)
+
+        concurrency_shed = shed_requests.value('api.dashboard', 'concurrency')
+        admission.store.acquire('api.dashboard', 1)
+        response = self.client.get('/api/dashboard', headers=manager)
+        self.assertEqual((response.status_code, response.headers['Retry-After']), (503, '1'))
+        self.assertEqual(shed_requests.value('api.dashboard', 'concurrency'), concurrency_shed + 1)
+        admission.store.release('api.dashboard')
+        self.assertIn('http_requests_shed_total{endpoint="api.dashboard",reason="concurrency"}',
+                      self.client.get('/metrics').data.decode())
+
+    def test_admission_limits_are_per_endpoint_and_method(self):
+        from admission import admission, MemoryStore
+        admission.configure(MemoryStore(), {'api.tasks': {'concurrency': 1, 'rate': 1, 'burst': 1, 'methods': ['GET']},
+                                            'api.dashboard': None})
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 0)
+
+        self.assertEqual(self.client.get('/api/tasks', headers=headers).status_code, 200)
+        self.assertEqual(self.client.get('/api/tasks', headers=headers).status_code, 429)
+        for _ in range(3):
+            response = self.client.post('/api/tasks', data=json.dumps({'title': 'x', 'project_id': 1}),
+                                        content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(self.client.get('/api/dashboard', headers=headers).status_code, 200)
+        self.assertTrue(admission.store.acquire('api.tasks', 1))
+
+    def test_admission_limits_logins_by_address_and_username(self):
+        from admission import admission, MemoryStore
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        admission.configure(MemoryStore(), {'api.login': {'rate': 0.01, 'burst': 2}})
+
+        def login(username, address):
+            return self.client.post('/api/login', data=json.dumps({'username': username, 'password': 'wrong'}),
+                                    content_type='application/json',
+                                    environ_base={'REMOTE_ADDR': address}).status_code
+
+        # Changing the username does not escape the address's bucket...
+        self.assertEqual([login(self.admin_username, '10.0.0.1'), login(self.manager_username, '10.0.0.1'),
+                          login('someone-else', '10.0.0.1')], [401, 401, 429])
+        # ...and changing the address does not escape the username's.
+        self.assertEqual([login(self.admin_username, '10.0.0.2'), login(self.admin_username, '10.0.0.3')], [401, 429])
+        self.assertEqual(login(self.developer_username, '10.0.0.3'), 401)
+
+        self.assertNotIsInstance(self.app.wsgi_app, ProxyFix)
+        proxied = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'PROXY_FIX_X_FOR': 1})
+        self.assertIsInstance(proxied.wsgi_app, ProxyFix)
+
+    def test_memory_store_evicts_least_recently_used_buckets(self):
+        from admission import MemoryStore
+        store = MemoryStore()
+        with mock.patch('admission.MAX_BUCKETS', 2):
+            self.assertEqual(store.take('a', 1, 1), 0)
+            self.assertEqual(store.take('b', 1, 1), 0)
+            self.assertGreater(store.take('a', 0.01, 1), 0)
+            self.assertEqual(store.take('c', 1, 1), 0)
+            self.assertEqual(list(store._buckets), ['a', 'c'])
+            self.assertEqual(store.take('b', 1, 1), 0)
+
+    def test_admission_task_list_rule_applies_to_admins_only(self):
+        from admission import admission, DEFAULT_LIMITS, MemoryStore
+        admission.configure(MemoryStore(), {'api.tasks': {**DEFAULT_LIMITS['api.tasks'], 'concurrency': 1}})
+        admin = {'Authorization': f"Bearer {self.login_user(self.admin_username, 'admin123')}"}
+        developer = {'Authorization': f"Bearer {self.login_user(self.developer_username, 'dev123')}"}
+
+        self.assertTrue(admission.store.acquire('api.tasks', 1))
+        self.assertEqual(self.client.get('/api/tasks', headers=admin).status_code, 503)
+        for _ in range(DEFAULT_LIMITS['api.tasks']['burst'] + 1):
+            self.assertEqual(self.client.get('/api/tasks', headers=developer).status_code, 200)
+        admission.store.release('api.tasks')
+        self.assertEqual(self.client.get('/api/tasks', headers=admin).status_code, 200)
+
     def test_create_project(self):
         """Test project creation."""
         token = self.login_user(self.admin_username, 'admin123')
@@ -182,6 +350,289 @@ class ProjectManagementTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertEqual(data['title'], 'Test Task')
 
+    def test_list_endpoints_use_constant_queries(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        self.seed_projects(2, 2)
+        with self.count_queries() as small:
+            self.client.get('/api/projects', headers=headers)
+            self.client.get('/api/tasks', headers=headers)
+
+        self.seed_projects(20, 5)
+        with self.count_queries() as large:
+            projects = json.loads(self.client.get('/api/projects', headers=headers).data)
+            tasks = json.loads(self.client.get('/api/tasks', headers=headers).data)
+
+        self.assertEqual(len(small), len(large))
+        self.assertLessEqual(len(large), 6)
+        self.assertEqual(len(projects), 22)
+        self.assertEqual({p['task_count'] for p in projects}, {2, 5})
+        self.assertEqual(len(projects[0]['team_members']), 3)
+        self.assertEqual(len(tasks), 104)
+        self.assertEqual(tasks[0]['assignee_name'], self.developer_username)
+        self.assertTrue(tasks[0]['project_name'].startswith('Seed'))
+
+    def test_task_list_cursor_pagination(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 7)
+
+        seen, cursor = [], ''
+        while True:
+            response = self.client.get(f'/api/tasks?limit=3&cursor={cursor}', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.data)
+            seen.extend(t['title'] for t in page['items'])
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+
+        self.assertEqual(seen, [f'Seed 0.{j}' for j in range(7)])
+
+        unpaginated = json.loads(self.client.get('/api/tasks', headers=headers).data)
+        self.assertEqual(len(unpaginated), 7)
+
+    def test_list_field_projection(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(2, 1)
+
+        tasks = json.loads(self.client.get('/api/tasks?fields=id,title', headers=headers).data)
+        self.assertEqual(set(tasks[0]), {'id', 'title'})
+
+        page = json.loads(self.client.get('/api/projects?fields=name&limit=1', headers=headers).data)
+        self.assertEqual(page['items'], [{'name': 'Seed 0'}])
+
+        users = json.loads(self.client.get('/api/users?fields=username', headers=headers).data)
+        self.assertEqual(len(users), 3)
+
+    def test_list_selects_only_requested_columns(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 2)
+
+        with self.count_queries() as statements:
+            self.client.get('/api/tasks?fields=id,title', headers=headers)
+        select = next(s for s in statements if 'task.title' in s)
+        self.assertNotIn('description', select)
+        self.assertNotIn('JOIN', select)
+
+        with self.count_queries() as statements:
+            tasks = json.loads(self.client.get('/api/tasks?fields=assignee_name,overdue', headers=headers).data)
+        self.assertEqual(tasks[0], {'assignee_name': self.developer_username, 'overdue': False})
+        self.assertTrue(any('LEFT OUTER JOIN user AS assignee' in s for s in statements))
+
+    def test_streaming_export(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(3, 4)
+
+        response = self.client.get('/api/tasks?stream=json', headers=headers)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual([t['title'] for t in json.loads(response.data)],
+                         [t['title'] for t in json.loads(self.client.get('/api/tasks', headers=headers).data)])
+
+        response = self.client.get('/api/projects?fields=name,task_count', headers={
+            **headers, 'Accept': 'application/x-ndjson'})
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(lines[0], {'name': 'Seed 0', 'task_count': 4})
+
+        self.client.post('/api/register', data=json.dumps({'username': 'idle', 'password': 'idle123'}),
+                         content_type='application/json')
+        idle = {'Authorization': f'Bearer {self.login_user("idle", "idle123")}'}
+        self.assertEqual(json.loads(self.client.get('/api/tasks?stream=json', headers=idle).data), [])
+
+    def test_columnar_lists(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(2, 3)
+        items = json.loads(self.client.get('/api/tasks', headers=headers).data)
+
+        table = json.loads(self.client.get('/api/tasks?shape=columns', headers=headers).data)
+        self.assertEqual([dict(zip(table['columns'], row)) for row in table['rows']], items)
+
+        page = json.loads(self.client.get('/api/projects?limit=1&shape=columns', headers=headers).data)
+        self.assertEqual(page['columns'][-1], 'team_members')
+        self.assertEqual(len(page['rows']), 1)
+        self.assertEqual(len(page['rows'][0][-1]), 3)
+        self.assertIsNotNone(page['next_cursor'])
+
+        exported = json.loads(self.client.get('/api/tasks?shape=columns&stream=json', headers=headers).data)
+        self.assertEqual(exported, table)
+        lines = self.client.get('/api/tasks?shape=columns&stream=ndjson', headers=headers).data.decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [table['columns']] + table['rows'])
+
+        response = self.client.get('/api/tasks?shape=wide', headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_responses_are_compressed_when_accepted(self):
+        import gzip
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(2, 20)
+        plain = self.client.get('/api/tasks', headers=headers)
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+        response = self.client.get('/api/tasks', headers={**headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data), plain.data)
+        self.assertLess(len(response.data), len(plain.data) / 4)
+
+        small = self.client.get('/api/tasks?limit=1&fields=id', headers={**headers, 'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', small.headers)
+
+        response = self.client.get('/api/tasks?stream=ndjson', headers={**headers, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(response.data).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], json.loads(plain.data))
+
+    @unittest.skipUnless(importlib.util.find_spec('brotli'), 'brotli not installed')
+    def test_brotli_preferred_when_available(self):
+        import brotli
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}', 'Accept-Encoding': 'gzip, br'}
+        self.seed_projects(2, 20)
+        response = self.client.get('/api/tasks', headers=headers)
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(len(json.loads(brotli.decompress(response.data))), 40)
+
+    @unittest.skipUnless(importlib.util.find_spec('msgpack'), 'msgpack not installed')
+    def test_msgpack_responses(self):
+        import msgpack
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 3)
+        packed = {**headers, 'Accept': 'application/msgpack'}
+
+        plain = self.client.get('/api/tasks?limit=2', headers=headers)
+        response = self.client.get('/api/tasks?limit=2', headers=packed)
+        self.assertEqual(response.mimetype, 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.data), json.loads(plain.data))
+        self.assertNotEqual(response.headers['ETag'], plain.headers['ETag'])
+
+        dashboard = self.client.get('/api/dashboard', headers=packed)
+        self.assertEqual(msgpack.unpackb(dashboard.data)['stats']['total_tasks'], 3)
+
+    def test_streaming_export_memory_is_flat(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 0)
+
+        def peak_for(total):
+            with self.app.app_context():
+                from bulk import insert_tasks
+                missing = total - Task.query.count()
+                insert_tasks([{'title': f'Export {i}', 'description': 'x' * 100, 'project_id': 1,
+                               'created_at': datetime.utcnow()} for i in range(missing)])
+                self.db.session.commit()
+            tracemalloc.start()
+            response = self.client.get('/api/tasks?stream=ndjson', headers=headers, buffered=False)
+            lines = sum(chunk.count(b'\n') for chunk in response.response)
+            response.close()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            self.assertEqual(lines, total)
+            return peak
+
+        peak_for(500)
+        small = peak_for(1500)
+        large = peak_for(15000)
+        self.assertLess(large, small * 2)
+
+    def test_invalid_pagination_parameters(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        response = self.client.get('/api/tasks?cursor=not-a-cursor', headers=headers)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/users?limit=abc', headers=headers)
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_create_tasks(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 0)
+        with self.app.app_context():
+            project_id = Project.query.first().id
+
+        items = [{'title': f'Bulk {i}', 'project_id': project_id, 'assigned_to': self.developer_id,
+                  'deadline': '2030-01-01T00:00:00'} for i in range(50)]
+        with self.count_queries() as statements:
+            response = self.client.post('/api/tasks/bulk', data=json.dumps(items),
+                                        content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 201)
+        ids = json.loads(response.data)['ids']
+        self.assertEqual(len(ids), 50)
+        self.assertLessEqual(sum(q.startswith('INSERT') for q in statements), 1)
+
+        with self.app.app_context():
+            self.assertEqual(self.db.session.get(Task, ids[7]).title, 'Bulk 7')
+
+    def test_bulk_create_tasks_validates_every_item(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 0)
+
+        items = [{'title': 'ok', 'project_id': 1}, {'project_id': 1}, {'title': 'x', 'project_id': 999},
+                 {'title': 'y', 'project_id': 1, 'deadline': 'soon'},
+                 {'title': 'z', 'project_id': 1, 'description': {'a': 1}},
+                 {'title': 'z', 'project_id': True}, {'title': 'z', 'project_id': 1, 'assigned_to': False},
+                 {'title': 'z' * 201, 'project_id': 1}, {'title': 'z' * 200, 'project_id': 1, 'description': None}]
+        response = self.client.post('/api/tasks/bulk', data=json.dumps(items),
+                                    content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e['index'] for e in json.loads(response.data)['details']], [1, 3, 4, 5, 6, 7])
+
+        response = self.client.post('/api/tasks/bulk', data=json.dumps(items[2:3]),
+                                    content_type='application/json', headers=headers)
+        self.assertEqual(json.loads(response.data)['details'], [{'index': 0, 'error': 'project not found'}])
+
+        with self.app.app_context():
+            self.assertEqual(Task.query.count(), 0)
+
+    def test_bulk_persist_user_stories(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 0)
+
+        response = self.client.post('/api/projects/1/user-stories',
+                                    data=json.dumps({'stories': ['As a user, one', 'As a user, two']}),
+                                    content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(json.loads(response.data)['ids']), 2)
+
+        self.client.post('/api/ai/generate-user-stories',
+                         data=json.dumps({'projectDescription': 'A todo app', 'projectId': 1}),
+                         content_type='application/json')
+        with self.app.app_context():
+            self.assertEqual(UserStory.query.filter_by(project_id=1).count(), 4)
+
+    def test_manager_scope_is_a_single_subquery(self):
+        token = self.login_user(self.manager_username, 'manager123')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        self.seed_projects(2, 1)
+        with self.count_queries() as small:
+            self.client.get('/api/tasks', headers=headers)
+            self.client.get('/api/dashboard', headers=headers)
+
+        self.seed_projects(200, 1)
+        with self.count_queries() as large:
+            tasks = json.loads(self.client.get('/api/tasks', headers=headers).data)
+            stats = json.loads(self.client.get('/api/dashboard', headers=headers).data)['stats']
+
+        self.assertEqual(len(small), len(large))
+        self.assertLess(max(q.count('?') for q in large), 10)
+        self.assertEqual(len(tasks), 202)
+        self.assertEqual(stats['total_projects'], 202)
+
+        developer = {'Authorization': f'Bearer {self.login_user(self.developer_username, "dev123")}'}
+        projects = json.loads(self.client.get('/api/projects', headers=developer).data)
+        self.assertEqual(len(projects), 202)
+
     def test_update_task_status(self):
         admin_token = self.login_user(self.admin_username, 'admin123')
 
@@ -226,6 +677,129 @@ class ProjectManagementTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIn('id', data)
 
+    def test_task_detail_embeds_latest_comments(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 1)
+        start = datetime(2025, 1, 1)
+
+        def add_comments(count):
+            with self.app.app_context():
+                offset = Comment.query.count()
+                self.db.session.add_all([
+                    Comment(content=f'c{offset + i}', task_id=1, user_id=self.manager_id,
+                            created_at=start + timedelta(minutes=offset + i))
+                    for i in range(count)
+                ])
+                self.db.session.commit()
+
+        add_comments(3)
+        with self.count_queries() as few:
+            self.client.get('/api/tasks/1', headers=headers)
+        add_comments(9)
+        with self.count_queries() as many:
+            response = self.client.get('/api/tasks/1', headers=headers)
+        self.assertEqual(len(few), len(many))
+
+        task = json.loads(response.data)
+        self.assertEqual(task['comment_count'], 12)
+        self.assertEqual([c['content'] for c in task['comments']], ['c11', 'c10', 'c9', 'c8', 'c7'])
+        self.assertEqual(task['comments'][0]['user'], self.manager_username)
+
+        seen, cursor = [], task['comments_cursor']
+        while cursor:
+            page = json.loads(self.client.get(f'/api/tasks/1/comments?limit=3&cursor={cursor}', headers=headers).data)
+            seen += [c['content'] for c in page['items']]
+            cursor = page['next_cursor']
+        self.assertEqual(seen, [f'c{i}' for i in range(6, -1, -1)])
+
+        page = json.loads(self.client.get('/api/tasks/1/comments?sort=created_at', headers=headers).data)
+        self.assertEqual(page['items'][0]['content'], 'c0')
+        self.assertEqual(self.client.get('/api/tasks/99/comments', headers=headers).status_code, 404)
+
+        for fields in ('content', 'id'):
+            seen, cursor = [], ''
+            while cursor is not None:
+                response = self.client.get(f'/api/tasks/1/comments?fields={fields}&limit=5&cursor={cursor}',
+                                           headers=headers)
+                self.assertEqual(response.status_code, 200)
+                page = json.loads(response.data)
+                self.assertTrue(all(list(item) == [fields] for item in page['items']))
+                seen += page['items']
+                cursor = page['next_cursor']
+            self.assertEqual(len(seen), 12)
+
+    def test_change_feed_respects_visibility(self):
+        from auth import Identity
+        admin = {'Authorization': f'Bearer {self.login_user(self.admin_username, "admin123")}'}
+        manager = feed.subscribe(Identity(self.manager_id, self.manager_username, 'manager'))
+        developer = feed.subscribe(Identity(self.developer_id, self.developer_username, 'developer'))
+
+        def drain(subscription):
+            events = []
+            while (event := subscription.next(timeout=0)) is not None:
+                events.append((event['type'], event['id']))
+            return events
+
+        self.client.post('/api/projects', data=json.dumps({'name': 'P'}),
+                         content_type='application/json', headers=admin)
+        self.client.post('/api/tasks', data=json.dumps({'title': 'hidden', 'project_id': 1}),
+                         content_type='application/json', headers=admin)
+        self.assertEqual(drain(manager), [])
+
+        self.client.post('/api/projects/1/members', data=json.dumps({'user_id': self.manager_id}),
+                         content_type='application/json', headers=admin)
+        self.client.post('/api/tasks', data=json.dumps({'title': 'mine', 'project_id': 1,
+                                                        'assigned_to': self.developer_id}),
+                         content_type='application/json', headers=admin)
+        self.client.post('/api/tasks/2/comments', data=json.dumps({'content': 'hi'}),
+                         content_type='application/json', headers=admin)
+        self.client.delete('/api/tasks/1', headers=admin)
+
+        self.assertEqual(drain(manager), [('project.member_added', 1), ('task.created', 2),
+                                          ('comment.created', 1), ('task.deleted', 1)])
+        self.assertEqual(drain(developer), [('task.created', 2), ('comment.created', 1)])
+
+    def test_change_feed_resyncs_slow_listeners(self):
+        from auth import Identity
+        feed.queue_size = 2
+        subscription = feed.subscribe(Identity(self.admin_id, self.admin_username, 'admin'))
+        for i in range(5):
+            feed.publish('task.updated', id=i, project_id=1, assigned_to=None)
+        self.assertEqual(subscription.next(timeout=0)['type'], 'resync')
+        self.assertIsNone(subscription.next(timeout=0))
+
+    def test_events_endpoint_streams_server_sent_events(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        self.app.config['EVENTS_HEARTBEAT'] = 1
+        response = self.client.get(f'/api/events?jwt={token}')
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        chunks = iter(response.response)
+        self.assertEqual(next(chunks), b'retry: 3000\n\n')
+
+        self.client.post('/api/projects', data=json.dumps({'name': 'Live'}), content_type='application/json',
+                         headers={'Authorization': f'Bearer {token}'})
+        chunk = next(chunks)
+        self.assertTrue(chunk.startswith(b'event: project.created\ndata: '))
+        self.assertEqual(json.loads(chunk.split(b'data: ')[1])['id'], 1)
+        self.assertEqual(next(chunks), b': keepalive\n\n')
+        response.close()
+        self.assertEqual(self.client.get('/api/events').status_code, 401)
+
+    def test_events_streams_are_capped_while_open(self):
+        from admission import admission, MemoryStore
+        admission.configure(MemoryStore(), {'api.events': {'concurrency': 1}})
+        token = self.login_user(self.admin_username, 'admin123')
+
+        first = self.client.get(f'/api/events?jwt={token}')
+        self.assertEqual(first.status_code, 200)
+        second = self.client.get(f'/api/events?jwt={token}')
+        self.assertEqual((second.status_code, second.headers['Retry-After']), (503, '1'))
+        first.close()
+        third = self.client.get(f'/api/events?jwt={token}')
+        self.assertEqual(third.status_code, 200)
+        third.close()
+
     def test_dashboard_access(self):
         """Test dashboard access with authentication."""
         token = self.login_user(self.admin_username, 'admin123')
@@ -237,6 +811,413 @@ class ProjectManagementTestCase(unittest.TestCase):
         self.assertIn('stats', data)
         self.assertIn('recent_tasks', data)
 
+    def test_dashboard_stats_scoped_by_role(self):
+        with self.app.app_context():
+            project = Project(name='Stats Project', created_by=self.manager_id)
+            other = Project(name='Other Project', created_by=self.admin_id)
+            self.db.session.add_all([project, other])
+            self.db.session.commit()
+
+            past = datetime.utcnow() - timedelta(days=1)
+            self.db.session.add_all([
+                Task(title='Late', project_id=project.id, assigned_to=self.developer_id, deadline=past),
+                Task(title='Doing', project_id=project.id, status='in_progress'),
+                Task(title='Finished', project_id=project.id, status='done', deadline=past),
+                Task(title='Elsewhere', project_id=other.id)
+            ])
+            self.db.session.commit()
+
+        token = self.login_user(self.admin_username, 'admin123')
+        data = json.loads(self.client.get('/api/dashboard', headers={'Authorization': f'Bearer {token}'}).data)
+        self.assertEqual(data['stats'], {
+            'total_projects': 2, 'total_tasks': 4, 'todo': 2, 'in_progress': 1, 'done': 1, 'overdue': 1
+        })
+        self.assertEqual(data['recent_tasks'][0]['title'], 'Elsewhere')
+        self.assertEqual(data['overdue_tasks'], [{
+            'id': data['overdue_tasks'][0]['id'],
+            'title': 'Late',
+            'project': 'Stats Project',
+            'deadline': data['overdue_tasks'][0]['deadline']
+        }])
+
+        token = self.login_user(self.manager_username, 'manager123')
+        data = json.loads(self.client.get('/api/dashboard', headers={'Authorization': f'Bearer {token}'}).data)
+        self.assertEqual(data['stats']['total_projects'], 1)
+        self.assertEqual(data['stats']['total_tasks'], 3)
+
+        token = self.login_user(self.developer_username, 'dev123')
+        data = json.loads(self.client.get('/api/dashboard', headers={'Authorization': f'Bearer {token}'}).data)
+        self.assertEqual(data['stats']['total_projects'], 0)
+        self.assertEqual(data['stats']['total_tasks'], 1)
+        self.assertEqual(data['stats']['overdue'], 1)
+
+    def test_detail_endpoints_answer_conditional_requests(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 2)
+
+        first = self.client.get('/api/projects/1', headers=headers)
+        etag = first.headers['ETag']
+        cached = self.client.get('/api/projects/1', headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.data, b'')
+
+        self.client.put('/api/tasks/1', data=json.dumps({'status': 'done'}),
+                        content_type='application/json', headers=headers)
+        changed = self.client.get('/api/projects/1', headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(json.loads(changed.data)['tasks'][0]['status'], 'done')
+
+        etag = self.client.get('/api/tasks/1', headers=headers).headers['ETag']
+        self.assertEqual(self.client.get('/api/tasks/1', headers={**headers, 'If-None-Match': etag}).status_code, 304)
+        self.client.post('/api/tasks/1/comments', data=json.dumps({'content': 'new'}),
+                         content_type='application/json', headers=headers)
+        self.assertEqual(self.client.get('/api/tasks/1', headers={**headers, 'If-None-Match': etag}).status_code, 200)
+
+    def test_list_endpoints_answer_conditional_requests(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(2, 2)
+
+        tasks_etag = self.client.get('/api/tasks', headers=headers).headers['ETag']
+        projects_etag = self.client.get('/api/projects', headers=headers).headers['ETag']
+        self.assertEqual(self.client.get('/api/tasks', headers={**headers, 'If-None-Match': tasks_etag}).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/tasks?fields=id', headers=headers).headers['ETag'], tasks_etag)
+        ndjson = self.client.get('/api/tasks', headers={**headers, 'Accept': 'application/x-ndjson',
+                                                        'If-None-Match': tasks_etag})
+        self.assertEqual((ndjson.status_code, ndjson.mimetype), (200, 'application/x-ndjson'))
+        self.assertNotEqual(ndjson.headers['ETag'], tasks_etag)
+        cached = self.client.get('/api/tasks', headers={**headers, 'If-None-Match': tasks_etag})
+        for response in (ndjson, cached, self.client.get('/api/users', headers=headers),
+                         self.client.get('/api/dashboard', headers=headers),
+                         self.client.get('/api/tasks?stream=json', headers=headers)):
+            self.assertIn('Accept', response.vary)
+
+        self.client.put('/api/projects/1', data=json.dumps({'name': 'Renamed'}),
+                        content_type='application/json', headers=headers)
+        self.assertEqual(self.client.get('/api/tasks', headers={**headers, 'If-None-Match': tasks_etag}).status_code, 200)
+
+        self.client.delete('/api/tasks/1', headers=headers)
+        response = self.client.get('/api/projects', headers={**headers, 'If-None-Match': projects_etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['task_count'], 1)
+
+    def test_list_versions_do_not_scan_tasks(self):
+        admin = {'Authorization': f"Bearer {self.login_user(self.admin_username, 'admin123')}"}
+        developer = {'Authorization': f"Bearer {self.login_user(self.developer_username, 'dev123')}"}
+        self.seed_projects(2, 5)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        with self.app.app_context():
+            engine = self.db.engine
+        for headers in (admin, developer):
+            for path in ('/api/tasks?limit=50', '/api/projects?limit=50'):
+                etag = self.client.get(path, headers=headers).headers['ETag']
+                event.listen(engine, 'before_cursor_execute', record)
+                response = self.client.get(path, headers={**headers, 'If-None-Match': etag})
+                event.remove(engine, 'before_cursor_execute', record)
+                self.assertEqual(response.status_code, 304)
+
+        with self.app.app_context():
+            connection = self.db.session.connection()
+            plans = [row[-1] for statement, parameters in statements
+                     for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+        self.assertTrue(plans)
+        self.assertFalse([plan for plan in plans if plan.startswith('SCAN task') or plan.startswith('SCAN project')])
+
+        etag = self.client.get('/api/tasks', headers=admin).headers['ETag']
+        self.client.post('/api/tasks/bulk', data=json.dumps([{'title': 'bulk', 'project_id': 1}]),
+                         content_type='application/json', headers=admin)
+        self.assertEqual(self.client.get('/api/tasks', headers={**admin, 'If-None-Match': etag}).status_code, 200)
+        etag = self.client.get('/api/projects', headers=admin).headers['ETag']
+        self.client.delete('/api/projects/2', headers=admin)
+        self.assertEqual(self.client.get('/api/projects', headers={**admin, 'If-None-Match': etag}).status_code, 200)
+
+        with self.app.app_context():
+            self.db.session.add(Task(title='due', project_id=1, deadline=datetime.utcnow() + timedelta(seconds=1)))
+            self.db.session.commit()
+        etag = self.client.get('/api/tasks', headers=admin).headers['ETag']
+        import time
+        time.sleep(1.1)
+        self.assertEqual(self.client.get('/api/tasks', headers={**admin, 'If-None-Match': etag}).status_code, 200)
+
+    def test_data_version_moves_last_before_commit(self):
+        headers = {'Authorization': f"Bearer {self.login_user(self.admin_username, 'admin123')}"}
+        self.seed_projects(1, 0)
+        writes = [
+            ('/api/tasks', {'title': 'one', 'project_id': 1}),
+            ('/api/tasks/bulk', [{'title': f'b{i}', 'project_id': 1} for i in range(3)]),
+        ]
+        for path, body in writes:
+            with self.count_queries() as statements:
+                response = self.client.post(path, data=json.dumps(body), content_type='application/json',
+                                            headers=headers)
+            self.assertEqual(response.status_code, 201)
+            changes = [statement for statement in statements if not statement.startswith('SELECT')]
+            self.assertEqual([i for i, statement in enumerate(changes) if 'data_version' in statement],
+                             [len(changes) - 1])
+
+        with self.count_queries() as statements:
+            self.client.get('/api/tasks', headers=headers)
+        self.assertFalse([statement for statement in statements if 'data_version' in statement
+                          and not statement.startswith('SELECT')])
+
+    def test_ensure_columns_adds_updated_at(self):
+        from migrations import ensure_columns
+        with self.app.app_context():
+            self.db.session.execute(text('ALTER TABLE comment DROP COLUMN updated_at'))
+            self.db.session.commit()
+            self.assertEqual(ensure_columns(), ['comment.updated_at'])
+            self.assertEqual(ensure_columns(), [])
+
+    def test_ensure_indexes_adds_missing_indexes(self):
+        from migrations import ensure_indexes
+        with self.app.app_context():
+            index = next(ix for ix in Task.__table__.indexes if ix.name == 'ix_task_open_deadline')
+            index.drop(self.db.engine)
+
+            self.assertEqual(ensure_indexes(), ['ix_task_open_deadline'])
+            self.assertEqual(ensure_indexes(), [])
+
+    def test_project_stats_follow_task_writes(self):
+        from database import ProjectStats
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        for name in ('A', 'B'):
+            self.client.post('/api/projects', data=json.dumps({'name': name}),
+                             content_type='application/json', headers=headers)
+        self.client.post('/api/tasks/bulk', data=json.dumps([
+            {'title': f'T{i}', 'project_id': 1} for i in range(3)
+        ]), content_type='application/json', headers=headers)
+        self.client.post('/api/tasks', data=json.dumps({'title': 'T3', 'project_id': 2}),
+                         content_type='application/json', headers=headers)
+
+        self.client.put('/api/tasks/1', data=json.dumps({'status': 'in_progress'}),
+                        content_type='application/json', headers=headers)
+        self.client.put('/api/tasks/2', data=json.dumps({'status': 'done'}),
+                        content_type='application/json', headers=headers)
+        self.client.put('/api/tasks/2', data=json.dumps({'status': 'blocked'}),
+                        content_type='application/json', headers=headers)
+        self.client.delete('/api/tasks/3', headers=headers)
+
+        def counts(project_id):
+            with self.app.app_context():
+                s = self.db.session.get(ProjectStats, project_id)
+                return s and (s.total, s.todo, s.in_progress, s.done)
+
+        self.assertEqual(counts(1), (2, 0, 1, 0))
+        self.assertEqual(counts(2), (1, 1, 0, 0))
+        stats = json.loads(self.client.get('/api/dashboard', headers=headers).data)['stats']
+        self.assertEqual((stats['total_tasks'], stats['todo'], stats['in_progress'], stats['done']), (3, 1, 1, 0))
+
+        self.client.delete('/api/projects/1', headers=headers)
+        self.assertIsNone(counts(1))
+
+    def test_admin_totals_include_tasks_without_project(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.client.post('/api/projects', data=json.dumps({'name': 'A'}),
+                         content_type='application/json', headers=headers)
+        self.client.post('/api/tasks', data=json.dumps({'title': 'T0', 'project_id': 1}),
+                         content_type='application/json', headers=headers)
+        response = self.client.post('/api/tasks', data=json.dumps({
+            'title': 'Loose', 'project_id': None,
+            'deadline': (datetime.utcnow() - timedelta(days=1)).isoformat()
+        }), content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, 201)
+
+        stats = json.loads(self.client.get('/api/dashboard', headers=headers).data)['stats']
+        self.assertEqual((stats['total_tasks'], stats['todo'], stats['overdue']), (2, 2, 1))
+
+    def test_task_list_filters_and_sorts_in_sql(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(2, 0)
+        now = datetime.utcnow()
+        with self.app.app_context():
+            self.db.session.add_all([
+                Task(title='a', project_id=1, status='todo', deadline=now - timedelta(days=2), assigned_to=self.developer_id),
+                Task(title='b', project_id=1, status='done', deadline=now - timedelta(days=1)),
+                Task(title='c', project_id=2, status='in_progress', deadline=now + timedelta(days=3)),
+                Task(title='d', project_id=2, status='todo'),
+            ])
+            self.db.session.commit()
+
+        def titles(query):
+            response = self.client.get(f'/api/tasks?{query}', headers=headers)
+            self.assertEqual(response.status_code, 200, response.data)
+            data = json.loads(response.data)
+            return [t['title'] for t in (data['items'] if isinstance(data, dict) else data)]
+
+        self.assertEqual(titles('overdue=true'), ['a'])
+        self.assertEqual(sorted(titles('overdue=false')), ['b', 'c', 'd'])
+        self.assertEqual(sorted(titles('status=todo,in_progress&project_id=2')), ['c', 'd'])
+        self.assertEqual(titles(f'assigned_to={self.developer_id}'), ['a'])
+        self.assertEqual(sorted(titles('assigned_to=none')), ['b', 'c', 'd'])
+        self.assertEqual(titles(f'deadline_after={(now - timedelta(days=1, hours=1)).isoformat()}'
+                                f'&deadline_before={(now + timedelta(days=1)).isoformat()}'), ['b'])
+        self.assertEqual(titles('sort=deadline'), ['a', 'b', 'c', 'd'])
+        self.assertEqual(titles('sort=-deadline'), ['c', 'b', 'a', 'd'])
+        self.assertEqual(titles('sort=-title&limit=2') + titles('sort=-title&limit=10&cursor=' + json.loads(
+            self.client.get('/api/tasks?sort=-title&limit=2', headers=headers).data)['next_cursor']),
+            ['d', 'c', 'b', 'a'])
+
+        seen, cursor = [], ''
+        while True:
+            page = json.loads(self.client.get(f'/api/tasks?sort=deadline&limit=1&cursor={cursor}', headers=headers).data)
+            seen += [t['title'] for t in page['items']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, ['a', 'b', 'c', 'd'])
+
+        for bad in ('sort=priority', 'project_id=x', 'overdue=maybe', 'deadline_before=soon'):
+            self.assertEqual(self.client.get(f'/api/tasks?{bad}', headers=headers).status_code, 400)
+
+    def test_search_ranks_and_scopes_results(self):
+        self.seed_projects(2, 0)
+        with self.app.app_context():
+            self.db.session.add_all([
+                Task(title='Deploy pipeline', description='deploy deploy', project_id=1, assigned_to=self.developer_id),
+                Task(title='Write docs', description='mention deploy once', project_id=1),
+                Task(title='Deploy hidden', project_id=2, assigned_to=self.admin_id),
+                Comment(content='Deploy failed on staging', task_id=2, user_id=self.manager_id),
+                UserStory(project_id=1, story='As an operator, I want to deploy safely'),
+            ])
+            self.db.session.commit()
+        admin = {'Authorization': f'Bearer {self.login_user(self.admin_username, "admin123")}'}
+        developer = {'Authorization': f'Bearer {self.login_user(self.developer_username, "dev123")}'}
+
+        items = json.loads(self.client.get('/api/search?q=deploy', headers=admin).data)['items']
+        self.assertEqual(len(items), 5)
+        self.assertEqual((items[0]['type'], items[0]['id']), ('task', 1))
+
+        items = json.loads(self.client.get('/api/search?q=deploy', headers=developer).data)['items']
+        self.assertEqual({(i['type'], i['id']) for i in items}, {('task', 1), ('user_story', 1)})
+
+        first = json.loads(self.client.get('/api/search?q=deploy&limit=3', headers=admin).data)
+        rest = json.loads(self.client.get(f'/api/search?q=deploy&limit=3&cursor={first["next_cursor"]}',
+                                          headers=admin).data)
+        self.assertEqual(len(first['items']) + len(rest['items']), 5)
+        self.assertIsNone(rest['next_cursor'])
+
+        self.client.put('/api/tasks/1', data=json.dumps({'title': 'Release pipeline', 'description': ''}),
+                        content_type='application/json', headers=admin)
+        self.client.delete('/api/tasks/2', headers=admin)
+        items = json.loads(self.client.get('/api/search?q=deploy&types=task,comment', headers=admin).data)['items']
+        self.assertEqual([(i['type'], i['id']) for i in items], [('task', 3)])
+        self.assertEqual(self.client.get('/api/search?q="(', headers=admin).status_code, 200)
+        self.assertEqual(self.client.get('/api/search?q=x&types=nope', headers=admin).status_code, 400)
+        for limit in ('abc', '0'):
+            self.assertEqual(self.client.get(f'/api/search?q=x&limit={limit}', headers=admin).status_code, 400)
+
+    def test_search_scores_are_double_precision_on_postgres(self):
+        from search import _match
+        from sqlalchemy.dialects import postgresql
+        _, score = _match('postgresql', Comment, 'comment_fts', (), (Comment.content,), 'deploy')
+        self.assertIn('AS FLOAT(53))', str(score.compile(dialect=postgresql.dialect())))
+
+    def test_benchmark_data_is_deterministic(self):
+        from benchmarks.datagen import generate
+        from project_stats import verify_stats
+        scale = {'users': 10, 'projects': 4, 'members': 3, 'tasks': 40, 'comments': 60}
+
+        def snapshot():
+            app, _ = create_test_app()
+            with app.app_context():
+                generate(scale)
+                self.assertEqual(verify_stats(), {})
+                rows = db.session.execute(text(
+                    'SELECT id, title, status, project_id, assigned_to, deadline FROM task ORDER BY id')).all()
+                members = db.session.execute(text('SELECT count(*) FROM project_members')).scalar()
+                db.session.remove()
+                db.drop_all()
+            return rows, members
+
+        first = snapshot()
+        self.assertEqual(len(first[0]), 40)
+        self.assertEqual(first[1], 12)
+        self.assertEqual(snapshot(), first)
+
+    def test_project_stats_verify_and_rebuild(self):
+        from project_stats import verify_stats, rebuild_stats
+        self.seed_projects(2, 3)
+        with self.app.app_context():
+            self.assertEqual(verify_stats(), {})
+            self.db.session.execute(text("INSERT INTO task (title, status, project_id) VALUES ('raw', 'done', 2)"))
+            self.db.session.commit()
+
+            drift = verify_stats()
+            self.assertEqual(list(drift), [2])
+            self.assertEqual(drift[2][1]['done'], 1)
+            self.assertEqual(rebuild_stats(), 2)
+            self.assertEqual(verify_stats(), {})
+
+    def test_project_delete_removes_dependents_in_bulk(self):
+        from project_stats import verify_stats
+        from database import ProjectStats, project_members
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(2, 40)
+        with self.app.app_context():
+            for task_id in (1, 2, 41):
+                self.db.session.add(Comment(content='needle', task_id=task_id, user_id=self.admin_id))
+            self.db.session.add_all([UserStory(project_id=1, story='needle story'),
+                                     UserStory(project_id=2, story='other story')])
+            self.db.session.commit()
+
+        with self.count_queries() as statements:
+            response = self.client.delete('/api/projects/1', headers=headers)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(len([s for s in statements if s.lstrip().upper().startswith('DELETE')]), 6)
+
+        with self.app.app_context():
+            self.assertIsNone(self.db.session.get(Project, 1))
+            self.assertIsNone(self.db.session.get(ProjectStats, 1))
+            self.assertEqual(Task.query.filter_by(project_id=1).count(), 0)
+            self.assertEqual(Task.query.filter_by(project_id=2).count(), 40)
+            self.assertEqual([c.task_id for c in Comment.query.all()], [41])
+            self.assertEqual([s.project_id for s in UserStory.query.all()], [2])
+            rows = self.db.session.execute(project_members.select()).all()
+            self.assertEqual({row.project_id for row in rows}, {2})
+            self.assertEqual(verify_stats(), {})
+
+        results = json.loads(self.client.get('/api/search?q=needle', headers=headers).data)
+        self.assertEqual([(r['type'], r['task_id']) for r in results['items']], [('comment', 41)])
+
+        self.assertEqual(self.client.delete('/api/tasks/41', headers=headers).status_code, 204)
+        with self.app.app_context():
+            self.assertEqual(Comment.query.count(), 0)
+            self.assertEqual(self.db.session.get(ProjectStats, 2).total, 39)
+            self.assertEqual(verify_stats(), {})
+
+    def test_request_instrumentation(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.seed_projects(1, 3)
+
+        with self.count_queries() as statements:
+            response = self.client.get('/api/tasks', headers=headers)
+        timing = response.headers['Server-Timing']
+        self.assertIn('app;dur=', timing)
+        self.assertIn(f'desc="{len(statements)} queries"', timing)
+
+        exposition = self.client.get('/metrics').data.decode()
+        self.assertIn('http_requests_total{endpoint="api.tasks",method="GET",status="200"}', exposition)
+        self.assertIn('http_request_sql_queries_bucket{endpoint="api.tasks",le="+Inf"}', exposition)
+        self.assertIn('http_response_size_bytes_count{endpoint="api.tasks"}', exposition)
+
+    def test_slow_queries_are_logged(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        self.app.config['SLOW_QUERY_MS'] = 0
+
+        with self.assertLogs('instrumentation', level='WARNING') as logs:
+            self.client.get('/api/dashboard', headers={'Authorization': f'Bearer {token}'})
+        self.assertTrue(any('in api.dashboard: SELECT' in line for line in logs.output))
+
     def test_role_based_access_users_endpoint(self):
         admin_token = self.login_user(self.admin_username, 'admin123')
         response = self.client.get('/api/users',
@@ -253,6 +1234,39 @@ class ProjectManagementTestCase(unittest.TestCase):
                                headers={'Authorization': f'Bearer {dev_token}'})
         self.assertEqual(response.status_code, 403)
 
+    def test_identity_resolved_once_and_cached(self):
+        token = self.login_user(self.admin_username, 'admin123')
+        headers = {'Authorization': f'Bearer {token}'}
+
+        with self.count_queries() as statements:
+            self.client.get('/api/users', headers=headers)
+        self.assertEqual(sum('FROM user' in q for q in statements), 2)
+
+        with self.count_queries() as statements:
+            self.client.get('/api/users', headers=headers)
+        self.assertEqual(len(statements), 1)
+
+    def test_identity_cache_invalidated_on_role_change(self):
+        token = self.login_user(self.developer_username, 'dev123')
+        headers = {'Authorization': f'Bearer {token}'}
+        self.assertEqual(self.client.get('/api/users', headers=headers).status_code, 403)
+
+        with self.app.app_context():
+            self.db.session.get(User, self.developer_id).role = 'manager'
+            self.db.session.commit()
+
+        self.assertEqual(self.client.get('/api/users', headers=headers).status_code, 200)
+
+    def test_role_claim_skips_user_lookup(self):
+        self.app.config['JWT_ROLE_CLAIM'] = True
+        token = self.login_user(self.manager_username, 'manager123')
+        identity_cache.clear()
+
+        with self.count_queries() as statements:
+            response = self.client.get('/api/users', headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(statements), 1)
+
     def test_ai_user_stories_generation(self):
         """Test AI user stories generation endpoint."""
         response = self.client.post('/api/ai/generate-user-stories',
@@ -265,5 +1279,181 @@ class ProjectManagementTestCase(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIsInstance(data, list)
 
+    def test_ai_story_job_poll_and_cache(self):
+        release = threading.Event()
+        self.fake_ai = ai_service.client = FakeGroqClient(release)
+        body = json.dumps({'projectDescription': 'A shared shopping list'})
+
+        first = self.client.post('/api/ai/jobs', data=body, content_type='application/json')
+        second = self.client.post('/api/ai/jobs', data=body, content_type='application/json')
+        self.assertEqual(first.status_code, 202)
+        job_id = json.loads(first.data)['id']
+        self.assertEqual(json.loads(second.data)['id'], job_id)
+
+        release.set()
+        story_jobs.get(job_id).wait(5)
+        data = json.loads(self.client.get(f'/api/ai/jobs/{job_id}').data)
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(len(data['stories']), 2)
+
+        cached = self.client.post('/api/ai/jobs', data=body, content_type='application/json')
+        self.assertEqual(cached.status_code, 200)
+        self.assertEqual(json.loads(cached.data)['stories'], data['stories'])
+        self.assertEqual(self.fake_ai.calls, 1)
+
+        self.assertEqual(self.client.get('/api/ai/jobs/missing').status_code, 404)
+
+    def test_ai_story_cache_expires(self):
+        now = [0]
+        jobs = ai_service.StoryJobs(cache_size=1, cache_ttl=10, clock=lambda: now[0])
+        jobs.submit('first').wait(5)
+        jobs.submit('second').wait(5)
+        jobs.submit('second').wait(5)
+        self.assertEqual(self.fake_ai.calls, 2)
+
+        jobs.submit('first').wait(5)
+        self.assertEqual(self.fake_ai.calls, 3)
+
+        now[0] = 10
+        jobs.submit('first').wait(5)
+        self.assertEqual(self.fake_ai.calls, 4)
+
+class EngineConfigTestCase(unittest.TestCase):
+    def test_engine_options_per_backend(self):
+        from engine import engine_options
+        self.assertEqual(engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'}), {})
+
+        sqlite = engine_options({'SQLALCHEMY_DATABASE_URI': 'sqlite:///app.db', 'DB_POOL_SIZE': 3})
+        self.assertEqual(sqlite['pool_size'], 3)
+        self.assertEqual(sqlite['connect_args'], {'timeout': 5.0})
+
+        postgres = engine_options({'SQLALCHEMY_DATABASE_URI': 'postgresql://u:p@db/app',
+                                   'DB_STATEMENT_TIMEOUT_MS': 1500})
+        self.assertTrue(postgres['pool_pre_ping'])
+        self.assertEqual(postgres['pool_recycle'], 1800)
+        self.assertEqual(postgres['connect_args'], {'options': '-c statement_timeout=1500'})
+
+    def test_sqlite_file_uses_wal(self):
+        import tempfile
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'wal.db')}"})
+
+        with app.app_context():
+            pragmas = [db.session.execute(text(f'PRAGMA {name}')).scalar()
+                       for name in ('journal_mode', 'busy_timeout', 'synchronous')]
+            db.session.remove()
+            db.engine.dispose()
+        self.assertEqual(pragmas, ['wal', 5000, 1])
+
+class JSONProviderTestCase(unittest.TestCase):
+    @unittest.skipUnless(importlib.util.find_spec('orjson'), 'orjson not installed')
+    def test_orjson_provider_matches_default_output(self):
+        from flask.json.provider import DefaultJSONProvider
+        from json_provider import OrjsonProvider
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertIsInstance(app.json, OrjsonProvider)
+
+        payload = {'b': [1, 2.5, None, True], 'a': {'when': datetime(2025, 1, 2, 3, 4, 5), 'x': 'ü'}}
+        default = DefaultJSONProvider(app)
+        self.assertEqual(json.loads(app.json.dumps(payload, separators=(',', ':'))),
+                         json.loads(default.dumps(payload)))
+        self.assertEqual(app.json.dumps({'b': 1, 'a': 2}), '{"a":2,"b":1}')
+        self.assertEqual(app.json.dumps({1: 'x'}), '{"1":"x"}')
+        self.assertEqual(app.json.loads('{"a": [1]}'), {'a': [1]})
+
+        plain = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'JSON_ORJSON': False})
+        self.assertNotIsInstance(plain.json, OrjsonProvider)
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    """Two SQLite files stand in for the primary and a replica that has not
+    caught up yet."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from replica import sticky_writes
+        self.directory = tempfile.mkdtemp()
+        primary = os.path.join(self.directory, 'primary.db')
+        replica = os.path.join(self.directory, 'replica.db')
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(sticky_writes.clear)
+        self.addCleanup(identity_cache.clear)
+        self.addCleanup(hashing_pool.shutdown)
+        # The bind registers its (empty) metadata on the shared db object.
+        self.addCleanup(db.metadatas.pop, 'replica', None)
+
+        seed = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}', 'BCRYPT_ROUNDS': 4})
+        with seed.app_context():
+            db.create_all()
+            db.session.add_all([User(username='admin', password=hash_password('pw'), role='admin'),
+                                User(username='manager', password=hash_password('pw'), role='manager')])
+            db.session.commit()
+            db.session.remove()
+            db.engine.dispose()
+        shutil.copy(primary, replica)
+
+        self.app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+            'DATABASE_REPLICA_URL': f'sqlite:///{replica}',
+            'JWT_SECRET_KEY': 'test-secret-key',
+            'BCRYPT_ROUNDS': 4
+        })
+        self.client = self.app.test_client()
+        self.addCleanup(self.dispose)
+
+    def dispose(self):
+        with self.app.app_context():
+            db.session.remove()
+            for engine in db.engines.values():
+                engine.dispose()
+
+    def headers(self, username):
+        response = self.client.post('/api/login', data=json.dumps({'username': username, 'password': 'pw'}),
+                                    content_type='application/json')
+        return {'Authorization': f"Bearer {json.loads(response.data)['token']}"}
+
+    def project_names(self, headers):
+        return [p['name'] for p in json.loads(self.client.get('/api/projects', headers=headers).data)]
+
+    def test_reads_use_replica_until_user_writes(self):
+        from replica import sticky_writes
+        admin, manager = self.headers('admin'), self.headers('manager')
+
+        response = self.client.post('/api/projects', data=json.dumps({'name': 'Fresh'}),
+                                    content_type='application/json', headers=manager)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.project_names(manager), ['Fresh'])
+        self.assertEqual(self.project_names(admin), [])
+
+        sticky_writes.clear()
+        self.assertEqual(self.project_names(manager), [])
+
+    def test_replica_bind_is_read_only_and_writes_go_to_primary(self):
+        from sqlalchemy.exc import OperationalError
+        with self.app.app_context():
+            with self.assertRaises(OperationalError):
+                with db.engines['replica'].begin() as connection:
+                    connection.execute(text("INSERT INTO project (name) VALUES ('x')"))
+
+        admin = self.headers('admin')
+        with self.app.test_request_context('/api/projects', headers=admin):
+            from flask_jwt_extended import verify_jwt_in_request
+            verify_jwt_in_request()
+            self.assertIs(db.session.get_bind(), db.engines['replica'])
+            db.session.add(Project(name='Read after write', created_by=1))
+            db.session.flush()
+            self.assertEqual([p.name for p in Project.query.all()], ['Read after write'])
+            db.session.rollback()
+
+class StartupTestCase(unittest.TestCase):
+    def test_create_app_does_not_import_ai_sdk(self):
+        """Workers that never generate stories should not pay for groq/httpx."""
+        from benchmarks.bench_startup import import_times
+
+        times = import_times('from app import create_app; '
+                             "create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})")
+        self.assertIn('flask', times)
+        self.assertNotIn('groq', times)
+        self.assertNotIn('httpx', times)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
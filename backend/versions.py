@@ -0,0 +1,59 @@
+from sqlalchemy import event, insert, select, update
+from database import db, DataVersion, User, Project, Task, project_members
+from replica import RoutingSession
+
+# Tables whose rows show up in (or decide the scope of) the project and
+# task lists.
+TRACKED = {table.name for table in (User.__table__, Project.__table__, Task.__table__, project_members)}
+TRACKED_MODELS = (User, Project, Task)
+ROW_ID = 1
+
+def version_subquery():
+    return select(DataVersion.value).where(DataVersion.id == ROW_ID).scalar_subquery()
+
+def current_version():
+    """The counter as one primary-key read, whatever the size of the tables
+    it covers."""
+    return db.session.execute(select(version_subquery())).scalar() or 0
+
+def _changed(session):
+    session.info['version_changed'] = True
+
+@event.listens_for(DataVersion.__table__, 'after_create')
+def _seed(target, connection, **kw):
+    connection.execute(insert(target).values(id=ROW_ID, value=0))
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _flushed(session, flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, TRACKED_MODELS):
+            _changed(session)
+            return
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _executed(state):
+    # Bulk inserts and set-based deletes bypass the flush.
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, 'table', None)
+        if table is not None and table.name in TRACKED:
+            _changed(state.session)
+
+@event.listens_for(RoutingSession, 'before_commit')
+def _bump(session):
+    # Writes only mark the session; the counter moves once, at commit. The
+    # pending changes are flushed first so the UPDATE is the transaction's
+    # last statement: its row lock is held just for the COMMIT, and a
+    # writer holding it never waits on another row.
+    if session.in_nested_transaction():
+        return
+    session.flush()
+    if not session.info.pop('version_changed', False):
+        return
+    statement = update(DataVersion).where(DataVersion.id == ROW_ID).values(value=DataVersion.value + 1)
+    connection = session.connection(bind_arguments={'clause': statement})
+    if connection.execute(statement).rowcount == 0:
+        connection.execute(insert(DataVersion).values(id=ROW_ID, value=1))
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _reset(session):
+    session.info.pop('version_changed', None)
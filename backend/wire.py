@@ -0,0 +1,93 @@
+from flask import current_app, request, jsonify, Response
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MSGPACK = 'application/msgpack'
+COMPRESSIBLE = ('application/json', 'application/x-ndjson', MSGPACK, 'text/plain')
+# Brotli's middle qualities compress better than gzip -6 at a similar cost;
+# the top ones are meant for static assets.
+BROTLI_QUALITY = 5
+
+def response_mimetype():
+    """application/msgpack when the client prefers it over JSON and msgpack
+    is installed; JSON otherwise."""
+    if msgpack is not None and request.accept_mimetypes.best_match(('application/json', MSGPACK)) == MSGPACK:
+        return MSGPACK
+    return 'application/json'
+
+def render(payload):
+    """``payload`` as JSON or MessagePack, whichever the client negotiated.
+    Values msgpack cannot encode go through the JSON provider's hook, so
+    both carry the same data. Marked ``Vary: Accept`` so shared caches keep
+    the formats apart."""
+    if response_mimetype() == MSGPACK:
+        response = Response(msgpack.packb(payload, default=current_app.json.default), mimetype=MSGPACK)
+    else:
+        response = jsonify(payload)
+    response.vary.add('Accept')
+    return response
+
+def _encoding():
+    return request.accept_encodings.best_match(['gzip'] if brotli is None else ['br', 'gzip'])
+
+def _compress(data, encoding, level):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, level)
+
+def _compress_stream(chunks, encoding, level):
+    """Compress a streamed body chunk by chunk, flushing after each so the
+    client can decode every batch as soon as it arrives."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+def compress(response):
+    """after_request hook: gzip or brotli bodies of at least
+    ``COMPRESS_MIN_BYTES``, and streamed exports whatever their size.
+    Server-sent events are left alone so each event is sent as it happens."""
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE):
+        return response
+    if not response.is_streamed and response.calculate_content_length() < current_app.config['COMPRESS_MIN_BYTES']:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _encoding()
+    if encoding is None:
+        return response
+    level = current_app.config['COMPRESS_LEVEL']
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        response.set_data(_compress(response.get_data(), encoding, level))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_compression(app):
+    app.after_request(compress)